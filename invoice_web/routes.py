@@ -6,10 +6,12 @@ Web端电子发票汇总系统 - API路由模块
 import json
 import os
 import tempfile
+from contextlib import closing
 from io import BytesIO
 from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
 from functools import wraps
+from itertools import chain
 from threading import Lock, Thread
 from time import sleep
 import uuid
@@ -312,98 +314,6 @@ def get_invoices():
         'total_pages': result['total_pages']
     })
 
-    manager = get_invoice_manager()
-    voucher_service = get_voucher_service()
-    person_service = get_reimbursement_person_service()
-    data_store = get_data_store()
-    search = request.args.get('search', '').strip()
-    start_date = request.args.get('start_date', '').strip()
-    end_date = request.args.get('end_date', '').strip()
-    reimbursement_person_id = request.args.get('reimbursement_person_id', '').strip()
-    uploaded_by = request.args.get('uploaded_by', '').strip()
-    reimbursement_status = request.args.get('reimbursement_status', '').strip()
-    record_type = request.args.get('record_type', '').strip()
-    
-    if search:
-        invoices = manager.search_invoices(search)
-    else:
-        invoices = manager.get_all_invoices()
-    
-    # 非管理员只能看到自己上传的发票
-    current_user = get_current_user()
-    if not current_user.get('is_admin', False):
-        user_display_name = current_user.get('display_name', '')
-        invoices = [inv for inv in invoices if inv.uploaded_by == user_display_name]
-    
-    # 按日期筛选
-    if start_date or end_date:
-        filtered = []
-        for inv in invoices:
-            inv_date = inv.invoice_date
-            if start_date and inv_date < start_date:
-                continue
-            if end_date and inv_date > end_date:
-                continue
-            filtered.append(inv)
-        invoices = filtered
-    
-    # 按报销人筛选
-    if reimbursement_person_id:
-        try:
-            person_id = int(reimbursement_person_id)
-            invoices = [inv for inv in invoices if inv.reimbursement_person_id == person_id]
-        except ValueError:
-            pass
-    
-    # 按上传人筛选
-    if uploaded_by:
-        invoices = [inv for inv in invoices if inv.uploaded_by == uploaded_by]
-    
-    # 按报销状态筛选
-    if reimbursement_status:
-        invoices = [inv for inv in invoices if inv.reimbursement_status == reimbursement_status]
-    
-    # 按记录类型筛选 (Requirements: 13.4, 13.5)
-    if record_type:
-        invoices = [inv for inv in invoices if inv.record_type == record_type]
-    
-    # 计算总金额和分类统计 (Requirements: 13.6)
-    total_amount = Decimal("0")
-    invoice_count = 0
-    manual_count = 0
-    invoice_amount = Decimal("0")
-    manual_amount = Decimal("0")
-    
-    for inv in invoices:
-        total_amount += inv.amount
-        if inv.record_type == 'manual':
-            manual_count += 1
-            manual_amount += inv.amount
-        else:
-            invoice_count += 1
-            invoice_amount += inv.amount
-    
-    # Build a map of person_id to person_name for efficiency
-    all_persons = person_service.get_all_persons()
-    person_map = {p.id: p.name for p in all_persons}
-    
-    # Get voucher counts and person names for each invoice
-    invoice_dicts = []
-    for inv in invoices:
-        voucher_count = voucher_service.get_voucher_count(inv.invoice_number)
-        person_name = person_map.get(inv.reimbursement_person_id, '') if inv.reimbursement_person_id else ''
-        invoice_dicts.append(invoice_to_dict(inv, voucher_count, person_name))
-    
-    return jsonify({
-        'invoices': invoice_dicts,
-        'total_count': len(invoices),
-        'total_amount': str(total_amount),
-        'invoice_count': invoice_count,
-        'manual_count': manual_count,
-        'invoice_amount': str(invoice_amount),
-        'manual_amount': str(manual_amount)
-    })
-
 
 @api.route('/invoices/<invoice_number>', methods=['GET'])
 @login_required
@@ -709,37 +619,46 @@ def export_invoices():
         Excel文件下载
     """
     try:
-        manager = get_invoice_manager()
         export_service = get_export_service()
+        temp_dir = tempfile.gettempdir()
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        export_path = os.path.join(temp_dir, f'invoices_export_{timestamp}.xlsx')
         
+        # GET请求导出所有发票：从数据库逐行读取并直接写入Excel，不在内存中保留全部记录
+        if request.method == 'GET':
+            # 生成器持有打开的连接和游标，提前返回或导出失败时也要立即关闭
+            with closing(get_data_store().iter_all()) as invoices:
+                first = next(invoices, None)
+                if first is None:
+                    return jsonify({'success': False, 'message': '没有可导出的发票'}), 400
+                export_service.export_to_excel(chain([first], invoices), export_path)
+            return send_file(
+                export_path,
+                as_attachment=True,
+                download_name=f'发票汇总_全部_{timestamp}.xlsx',
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        
+        manager = get_invoice_manager()
         all_invoices = manager.get_all_invoices()
         
-        # 如果是POST请求，处理批量导出
-        if request.method == 'POST':
-            data = request.get_json()
-            
-            # 支持通过发票号码列表导出
-            if data and 'invoice_numbers' in data:
-                invoice_numbers = data['invoice_numbers']
-                invoices = [inv for inv in all_invoices if inv.invoice_number in invoice_numbers]
-            # 支持通过序号列表导出
-            elif data and 'indices' in data:
-                indices = data['indices']
-                invoices = [all_invoices[i] for i in indices if 0 <= i < len(all_invoices)]
-            else:
-                invoices = all_invoices
+        # POST请求处理批量导出
+        data = request.get_json()
+        
+        # 支持通过发票号码列表导出
+        if data and 'invoice_numbers' in data:
+            invoice_numbers = data['invoice_numbers']
+            invoices = [inv for inv in all_invoices if inv.invoice_number in invoice_numbers]
+        # 支持通过序号列表导出
+        elif data and 'indices' in data:
+            indices = data['indices']
+            invoices = [all_invoices[i] for i in indices if 0 <= i < len(all_invoices)]
         else:
-            # GET请求导出所有发票
             invoices = all_invoices
         
         if not invoices:
             return jsonify({'success': False, 'message': '没有可导出的发票'}), 400
         
-        # 创建临时文件
-        temp_dir = tempfile.gettempdir()
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        export_path = os.path.join(temp_dir, f'invoices_export_{timestamp}.xlsx')
-        
         # 导出
         export_service.export_to_excel(invoices, export_path)
         
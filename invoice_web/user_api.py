@@ -383,12 +383,13 @@ def confirm_upload():
         voucher_service = get_voucher_service()
         voucher_files = request.files.getlist('voucher_files[]')
         
-        for voucher_file in voucher_files:
-            if voucher_file.filename:
-                if not voucher_service.validate_file_format(voucher_file.filename):
-                    continue  # 跳过无效格式
-                file_data = voucher_file.read()
-                voucher_service.add_voucher(invoice.invoice_number, file_data, voucher_file.filename)
+        # 凭证在单个事务中批量写入，无效格式由add_vouchers_bulk跳过
+        voucher_uploads = [
+            (voucher_file.read(), voucher_file.filename)
+            for voucher_file in voucher_files
+            if voucher_file.filename
+        ]
+        voucher_service.add_vouchers_bulk(invoice.invoice_number, voucher_uploads)
         
         # 保存合同（如果有）
         if has_contract:
@@ -616,62 +617,6 @@ def get_invoices():
         'total_pages': result['total_pages']
     })
 
-    manager = get_invoice_manager()
-    voucher_service = get_voucher_service()
-    person_service = get_reimbursement_person_service()
-    
-    # 获取所有发票
-    invoices = manager.get_all_invoices()
-    
-    # 只返回当前用户上传的发票
-    current_user = get_current_user()
-    user_display_name = current_user.get('display_name', '')
-    invoices = [inv for inv in invoices if inv.uploaded_by == user_display_name]
-    
-    # 获取record_type查询参数
-    record_type_filter = request.args.get('record_type', '').strip()
-    
-    # 应用record_type过滤
-    if record_type_filter in ['invoice', 'manual']:
-        invoices = [inv for inv in invoices if inv.record_type == record_type_filter]
-    
-    # 计算总金额和分类统计
-    total_amount = Decimal("0")
-    invoice_count = 0
-    manual_count = 0
-    invoice_amount = Decimal("0")
-    manual_amount = Decimal("0")
-    
-    for inv in invoices:
-        total_amount += inv.amount
-        if inv.record_type == 'manual':
-            manual_count += 1
-            manual_amount += inv.amount
-        else:
-            invoice_count += 1
-            invoice_amount += inv.amount
-    
-    # 构建报销人映射
-    all_persons = person_service.get_all_persons()
-    person_map = {p.id: p.name for p in all_persons}
-    
-    # 构建响应
-    invoice_dicts = []
-    for inv in invoices:
-        voucher_count = voucher_service.get_voucher_count(inv.invoice_number)
-        person_name = person_map.get(inv.reimbursement_person_id, '') if inv.reimbursement_person_id else ''
-        invoice_dicts.append(invoice_to_dict(inv, voucher_count, person_name))
-    
-    return jsonify({
-        'invoices': invoice_dicts,
-        'total_count': len(invoices),
-        'total_amount': str(total_amount),
-        'invoice_count': invoice_count,
-        'manual_count': manual_count,
-        'invoice_amount': str(invoice_amount),
-        'manual_amount': str(manual_amount)
-    })
-
 
 @user_api.route('/invoices/<invoice_number>', methods=['GET'])
 @user_login_required
@@ -1106,16 +1051,13 @@ def create_manual_record():
             voucher_service = get_voucher_service()
             voucher_files = request.files.getlist('voucher_files[]')
             
-            for voucher_file in voucher_files:
-                if voucher_file.filename:
-                    # 验证文件格式
-                    if not voucher_service.validate_file_format(voucher_file.filename):
-                        continue  # 跳过无效格式
-                    
-                    # 保存凭证
-                    file_data = voucher_file.read()
-                    voucher_service.add_voucher(record_id, file_data, voucher_file.filename)
-                    voucher_count += 1
+            # 凭证在单个事务中批量写入，无效格式由add_vouchers_bulk跳过
+            voucher_uploads = [
+                (voucher_file.read(), voucher_file.filename)
+                for voucher_file in voucher_files
+                if voucher_file.filename
+            ]
+            voucher_count = len(voucher_service.add_vouchers_bulk(record_id, voucher_uploads))
         
         # 获取报销人名称
         person_name = ''
@@ -4,7 +4,8 @@ User Portal Routes Blueprint
 """
 
 from functools import wraps
-from flask import Blueprint, render_template, session, redirect, url_for
+from flask import Blueprint, current_app, render_template, session, redirect, url_for
+from markupsafe import Markup
 
 # Create Blueprint for user portal routes
 user_bp = Blueprint(
@@ -30,6 +31,19 @@ def user_login_required(f):
     return decorated_function
 
 
+def get_mode_selector_html() -> Markup:
+    """
+    获取上传模式选择器HTML片段
+    
+    该片段不含任何请求相关内容，每个应用只渲染一次并缓存在app.config中
+    """
+    html = current_app.config.get('_mode_selector_html')
+    if html is None:
+        html = Markup(render_template('user/_mode_selector.html'))
+        current_app.config['_mode_selector_html'] = html
+    return html
+
+
 @user_bp.route('/login')
 def login():
     """
@@ -51,7 +65,7 @@ def upload():
     
     GET /user/ - 显示发票上传界面
     """
-    return render_template('user/upload.html')
+    return render_template('user/upload.html', mode_selector_html=get_mode_selector_html())
 
 
 @user_bp.route('/invoices')
@@ -3,16 +3,47 @@ ExportService for exporting invoice data to Excel.
 导出服务 - 负责将发票数据导出到Excel文件
 """
 
+import os
 from decimal import Decimal
-from typing import List
+from typing import BinaryIO, Iterable, Union
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 
 from src.models import Invoice
 
 
+# Excel表头，顺序与数据行字段一致
+HEADER = (
+    "发票号码",
+    "记录类型",
+    "开票日期",
+    "项目名称",
+    "金额",
+    "备注",
+    "源文件路径",
+    "扫描时间",
+)
+
+# 记录类型显示名称
+RECORD_TYPE_LABELS = {"invoice": "发票", "manual": "无票报销"}
+
+# 列宽，与HEADER一一对应
+COLUMN_WIDTHS = (20, 12, 15, 30, 15, 30, 40, 20)
+
+# The zip writer emits many small chunks; a buffer well above
+# io.DEFAULT_BUFFER_SIZE (8 KiB) batches them into far fewer write syscalls
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Style objects are immutable, so one instance is shared by every cell and export
+_BOLD_FONT = Font(bold=True)
+_HEADER_ALIGNMENT = Alignment(horizontal='center')
+_THIN_SIDE = Side(style='thin')
+_THIN_BORDER = Border(left=_THIN_SIDE, right=_THIN_SIDE, top=_THIN_SIDE, bottom=_THIN_SIDE)
+
+
 class ExportService:
     """
     导出服务类，负责将发票数据导出到Excel文件
@@ -30,110 +61,88 @@ class ExportService:
         """
         return f"{amount:.2f}"
     
-    def export_to_excel(self, invoices: List[Invoice], output_path: str) -> None:
+    def export_to_excel(self, invoices: Iterable[Invoice], output_path: Union[str, BinaryIO]) -> None:
         """
         导出发票数据到Excel文件
         
         Args:
-            invoices: 发票列表
-            output_path: 输出文件路径
+            invoices: 发票列表或任意可迭代对象（如生成器），只遍历一次
+            output_path: 输出文件路径，或可写的二进制文件对象（如io.BytesIO）
             
         Raises:
             IOError: 文件写入失败时抛出
         """
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "发票汇总"
+        # Write-only mode streams rows straight to the file instead of keeping
+        # every cell object in memory; rows must be written in order
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("发票汇总")
         
-        # Define headers
-        headers = [
-            "发票号码",
-            "记录类型",
-            "开票日期", 
-            "项目名称",
-            "金额",
-            "备注",
-            "源文件路径",
-            "扫描时间"
-        ]
-
-        # Style for headers
-        header_font = Font(bold=True)
-        header_alignment = Alignment(horizontal='center')
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        # Column widths must be set before any row is written
+        for col, width in enumerate(COLUMN_WIDTHS, 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
         
         # Write headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.alignment = header_alignment
-            cell.border = thin_border
+        header_cells = []
+        for header in HEADER:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = _BOLD_FONT
+            cell.alignment = _HEADER_ALIGNMENT
+            cell.border = _THIN_BORDER
+            header_cells.append(cell)
+        ws.append(header_cells)
         
-        # Write invoice data
-        for row, invoice in enumerate(invoices, 2):
-            # 发票号码
-            ws.cell(row=row, column=1, value=invoice.invoice_number).border = thin_border
-            
-            # 记录类型：显示"发票"或"无票报销"
-            record_type_display = "无票报销" if invoice.record_type == "manual" else "发票"
-            ws.cell(row=row, column=2, value=record_type_display).border = thin_border
-            
-            # 其他字段
-            ws.cell(row=row, column=3, value=invoice.invoice_date).border = thin_border
-            ws.cell(row=row, column=4, value=invoice.item_name).border = thin_border
-            ws.cell(row=row, column=5, value=self.format_amount(invoice.amount)).border = thin_border
-            ws.cell(row=row, column=6, value=invoice.remark).border = thin_border
-            ws.cell(row=row, column=7, value=invoice.file_path).border = thin_border
-            ws.cell(row=row, column=8, value=invoice.scan_time.strftime("%Y-%m-%d %H:%M:%S")).border = thin_border
-        
-        # Add summary statistics row
-        summary_row = len(invoices) + 3
-        
-        # Calculate statistics by record type
-        total_amount = Decimal("0")
+        # Write invoice data and accumulate the summary in the same pass
+        labels = RECORD_TYPE_LABELS
         invoice_count = 0
         manual_count = 0
         invoice_amount = Decimal("0")
         manual_amount = Decimal("0")
         
-        for inv in invoices:
-            total_amount += inv.amount
-            if inv.record_type == 'manual':
+        for invoice in invoices:
+            row_cells = []
+            for value in (
+                invoice.invoice_number,
+                labels.get(invoice.record_type, "发票"),
+                invoice.invoice_date,
+                invoice.item_name,
+                self.format_amount(invoice.amount),
+                invoice.remark,
+                invoice.file_path,
+                invoice.scan_time.strftime("%Y-%m-%d %H:%M:%S")
+            ):
+                cell = WriteOnlyCell(ws, value=value)
+                cell.border = _THIN_BORDER
+                row_cells.append(cell)
+            ws.append(row_cells)
+            if invoice.record_type == 'manual':
                 manual_count += 1
-                manual_amount += inv.amount
+                manual_amount += invoice.amount
             else:
                 invoice_count += 1
-                invoice_amount += inv.amount
+                invoice_amount += invoice.amount
         
-        # Summary label
-        ws.cell(row=summary_row, column=1, value="汇总统计").font = Font(bold=True)
-        ws.cell(row=summary_row, column=2, value=f"总记录数: {len(invoices)}")
-        ws.cell(row=summary_row, column=3, value="总金额:")
-        ws.cell(row=summary_row, column=4, value=self.format_amount(total_amount)).font = Font(bold=True)
+        total_count = invoice_count + manual_count
+        total_amount = invoice_amount + manual_amount
         
-        # Detailed statistics
-        ws.cell(row=summary_row + 1, column=1, value="")
-        ws.cell(row=summary_row + 1, column=2, value=f"发票记录: {invoice_count}张")
-        ws.cell(row=summary_row + 1, column=3, value="发票金额:")
-        ws.cell(row=summary_row + 1, column=4, value=self.format_amount(invoice_amount))
+        # Add summary statistics after one blank row
+        ws.append([])
         
-        ws.cell(row=summary_row + 2, column=1, value="")
-        ws.cell(row=summary_row + 2, column=2, value=f"无票报销记录: {manual_count}张")
-        ws.cell(row=summary_row + 2, column=3, value="无票报销金额:")
-        ws.cell(row=summary_row + 2, column=4, value=self.format_amount(manual_amount))
+        summary_label = WriteOnlyCell(ws, value="汇总统计")
+        summary_label.font = _BOLD_FONT
+        total_cell = WriteOnlyCell(ws, value=self.format_amount(total_amount))
+        total_cell.font = _BOLD_FONT
+        ws.append([summary_label, f"总记录数: {total_count}", "总金额:", total_cell])
         
-        # Adjust column widths
-        column_widths = [20, 12, 15, 30, 15, 30, 40, 20]
-        for col, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(col)].width = width
+        # Detailed statistics
+        ws.append(["", f"发票记录: {invoice_count}张", "发票金额:", self.format_amount(invoice_amount)])
+        ws.append(["", f"无票报销记录: {manual_count}张", "无票报销金额:", self.format_amount(manual_amount)])
         
         # Save workbook
         try:
-            wb.save(output_path)
+            if isinstance(output_path, (str, os.PathLike)):
+                with open(output_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as fp:
+                    wb.save(fp)
+            else:
+                wb.save(output_path)
         except Exception as e:
             raise IOError(f"Failed to export to Excel file {output_path}: {e}")
@@ -6,6 +6,7 @@ Requirements: 3.1, 3.2
 """
 
 import os
+import sqlite3
 from typing import List, Tuple
 
 from src.data_store import DataStore
@@ -99,6 +100,15 @@ class MigrationService:
         except Exception as e:
             return (0, 0, [f"读取JSON文件失败: {e}"])
         
+        # 常见情况（目标库中没有重复发票）整批在一个事务中写入
+        try:
+            self._sqlite_store.insert_many(invoices)
+            return (len(invoices), 0, [])
+        except sqlite3.IntegrityError:
+            # 目标库中已有部分发票，整批已回滚，逐条插入以区分重复（跳过）和其他错误；
+            # 其他异常（表结构不符、序列化错误等）直接抛出，不逐条重试
+            pass
+        
         for invoice in invoices:
             try:
                 self._sqlite_store.insert(invoice)
@@ -4,6 +4,7 @@ Data models for the Invoice Summary System.
 """
 
 import random
+import re
 import string
 from dataclasses import dataclass
 from datetime import datetime
@@ -32,7 +33,7 @@ class User:
     is_admin: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class Invoice:
     """
     发票数据模型
@@ -307,6 +308,11 @@ class ManualRecordIDGenerator:
     例如：MANUAL-20251228-143052-A3F2
     """
     
+    _ALPHABET = string.ascii_uppercase + string.digits
+    _SUFFIX_LENGTH = 4
+    # 校验手动记录ID格式，用PATTERN.fullmatch(record_id)判断
+    PATTERN = re.compile(r"MANUAL-\d{8}-\d{6}-[A-Z0-9]{4}")
+
     @staticmethod
     def generate() -> str:
         """
@@ -315,9 +321,27 @@ class ManualRecordIDGenerator:
         Returns:
             格式为 MANUAL-YYYYMMDD-HHMMSS-XXXX 的唯一标识符
         """
-        now = datetime.now()
-        date_part = now.strftime("%Y%m%d")
-        time_part = now.strftime("%H%M%S")
-        random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
+        return ManualRecordIDGenerator.generate_batch(1)[0]
+
+    @classmethod
+    def generate_batch(cls, n: int) -> List[str]:
+        """
+        批量生成手动记录ID，整批共用一个时间戳，随机后缀在批内互不重复
         
-        return f"MANUAL-{date_part}-{time_part}-{random_part}"
+        Args:
+            n: 需要生成的ID数量
+            
+        Returns:
+            格式为 MANUAL-YYYYMMDD-HHMMSS-XXXX 的唯一标识符列表
+        """
+        prefix = datetime.now().strftime("MANUAL-%Y%m%d-%H%M%S-")
+        base = len(cls._ALPHABET)
+        ids = []
+        # 一次性抽取n个不重复的后缀编号，再按字母表编码为定长后缀
+        for value in random.sample(range(base ** cls._SUFFIX_LENGTH), n):
+            suffix = []
+            for _ in range(cls._SUFFIX_LENGTH):
+                value, digit = divmod(value, base)
+                suffix.append(cls._ALPHABET[digit])
+            ids.append(prefix + ''.join(suffix))
+        return ids
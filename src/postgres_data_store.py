@@ -131,6 +131,18 @@ class _PostgreSQLCursorAdapter:
 
         return self
 
+    def executemany(self, sql: str, seq_of_params: Sequence[Sequence[Any]]):
+        self._fake_rows = None
+        self._lastrowid = None
+
+        translated_sql = _translate_sql_for_postgres(sql)
+        try:
+            self._cursor.executemany(translated_sql, [tuple(params) for params in seq_of_params])
+        except self._psycopg2.IntegrityError as exc:
+            raise sqlite3.IntegrityError(str(exc)) from exc
+
+        return self
+
     def fetchone(self):
         if self._fake_rows is not None:
             if not self._fake_rows:
@@ -138,6 +150,11 @@ class _PostgreSQLCursorAdapter:
             return self._fake_rows.pop(0)
         return self._cursor.fetchone()
 
+    def __iter__(self):
+        if self._fake_rows is not None:
+            return iter(self.fetchall())
+        return iter(self._cursor)
+
     def fetchall(self):
         if self._fake_rows is not None:
             rows = list(self._fake_rows)
@@ -286,6 +303,8 @@ class PostgreSQLDataStore(SQLiteDataStore):
         self._memory_keeper = None
         self._memory_uri = None
         self._is_memory_db = False
+        self._durable = True
+        self._uri = False
         self._psycopg2 = self._load_psycopg2()
         self._pool = self._psycopg2.pool.ThreadedConnectionPool(
             minconn=min_conn,
@@ -8,39 +8,125 @@ import sqlite3
 import uuid
 from datetime import datetime
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 import hashlib
 from src.models import Invoice, User, ExpenseVoucher, ReimbursementPerson, Contract, ElectronicSignature, SignatureTemplate
 
 
+class _ClosingConnection(sqlite3.Connection):
+    """
+    退出with块时在提交/回滚之后关闭的连接
+
+    sqlite3.Connection自身的__exit__只结束事务不关闭连接，连接要等垃圾回收
+    才释放，期间文件句柄和共享内存库都不会被释放。
+    """
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            return super().__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            self.close()
+
+
 class SQLiteDataStore:
     """
     SQLite数据存储类，负责发票数据的数据库存储和查询
     """
     
     DEFAULT_DB_PATH = "data/invoices.db"
+
+    # 本进程内已完成建表和迁移的数据库文件 -> 完成时的schema_version
+    _MIGRATED: Dict[tuple, int] = {}
+
+    # Column order matches serialize_invoice(); kept as one constant so the
+    # statement is prepared once per batch and hits sqlite3's statement cache.
+    _INSERT_INVOICE_SQL = """
+        INSERT INTO invoices
+        (invoice_number, invoice_date, item_name, amount, remark, file_path, scan_time, uploaded_by, reimbursement_person_id, reimbursement_status, record_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    # The literal record_type lets SQLite match the partial index idx_manual_dup
+    _MANUAL_DUPLICATE_SQL = """
+        SELECT * FROM invoices 
+        WHERE amount = ?
+          AND invoice_date = ?
+          AND item_name = ?
+          AND uploaded_by = ?
+          AND record_type = 'manual'
+    """
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, durable: bool = True, uri: bool = False):
         """
         初始化数据库连接
         
         Args:
             db_path: 数据库文件路径，默认为 "data/invoices.db"
+            durable: 是否保证提交落盘；测试库可传False，使用内存日志并跳过fsync
+            uri: db_path是否为SQLite URI（如 "file:name?mode=memory&cache=shared"）
         """
         self.db_path = db_path or self.DEFAULT_DB_PATH
+        self._durable = durable
+        self._uri = uri
         self._memory_keeper: Optional[sqlite3.Connection] = None
         self._memory_uri: Optional[str] = None
-        self._is_memory_db = self.db_path == ':memory:'
-        if self._is_memory_db:
+        if self.db_path == ':memory:':
             self._memory_uri = f"file:invoice_mgmt_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        elif uri and 'mode=memory' in self.db_path:
+            self._memory_uri = self.db_path
+        self._is_memory_db = self._memory_uri is not None
+        if self._is_memory_db:
+            # 内存库在最后一个连接关闭时销毁，保留一个连接维持其生命周期。
+            # 各方法仍按调用新建连接并通过共享缓存URI访问同一份数据，因此Flask
+            # 在其他线程处理请求时也能看到该内存库，无需在线程间共用单个连接
             self._memory_keeper = sqlite3.connect(self._memory_uri, uri=True, check_same_thread=False)
             self._configure_connection(self._memory_keeper)
         self._ensure_data_dir()
-        self._init_database()
+        # journal_mode=WAL持久保存在文件中，但同一文件可能先被非持久模式（journal_mode=MEMORY）
+        # 的实例打开过，因此不放在按文件缓存、可能被跳过的迁移步骤里，每次都确认一遍
+        if self._durable and not self._is_memory_db:
+            with self._get_connection() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+        if not self._is_migrated():
+            self._init_database()
+            self._mark_migrated()
+    
+    def _migration_key(self) -> Optional[tuple]:
+        """返回用于识别数据库文件的键；内存库和URI库不做缓存"""
+        if self._uri or self._is_memory_db:
+            return None
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return (os.path.realpath(self.db_path), stat.st_dev, stat.st_ino)
+
+    def _schema_version(self) -> int:
+        with self._get_connection() as conn:
+            return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+    def _is_migrated(self) -> bool:
+        """
+        判断本进程是否已对该数据库文件执行过建表和迁移
+        
+        schema_version在每次DDL后递增，文件被删除重建或被其他进程改动表结构时
+        都会与记录值不一致，此时重新执行迁移。
+        """
+        key = self._migration_key()
+        if key is None or key not in self._MIGRATED:
+            return False
+        return self._schema_version() == self._MIGRATED[key]
+
+    def _mark_migrated(self) -> None:
+        key = self._migration_key()
+        if key is not None:
+            self._MIGRATED[key] = self._schema_version()
     
     def _ensure_data_dir(self) -> None:
         """确保数据目录存在"""
+        if self._uri or self._is_memory_db:
+            return
         data_dir = os.path.dirname(self.db_path)
         if data_dir and not os.path.exists(data_dir):
             os.makedirs(data_dir)
@@ -48,9 +134,12 @@ class SQLiteDataStore:
     def _get_connection(self) -> sqlite3.Connection:
         """获取数据库连接"""
         if self._is_memory_db and self._memory_uri:
-            conn = sqlite3.connect(self._memory_uri, uri=True, check_same_thread=False)
+            conn = sqlite3.connect(self._memory_uri, uri=True, check_same_thread=False,
+                                   factory=_ClosingConnection)
+        elif self._uri:
+            conn = sqlite3.connect(self.db_path, uri=True, factory=_ClosingConnection)
         else:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, factory=_ClosingConnection)
         self._configure_connection(conn)
         return conn
 
@@ -58,15 +147,61 @@ class SQLiteDataStore:
         """Apply per-connection pragmas."""
         conn.execute("PRAGMA foreign_keys = ON")
         conn.execute("PRAGMA busy_timeout = 3000")
+        # Only journal_mode=WAL is persisted in the file; the remaining
+        # pragmas have to be applied to every new connection.
+        if self._durable:
+            conn.execute("PRAGMA synchronous = NORMAL")
+        else:
+            conn.execute("PRAGMA journal_mode = MEMORY")
+            conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA mmap_size = 268435456")
         conn.row_factory = sqlite3.Row
-    
+
+    def close(self) -> None:
+        """
+        释放数据存储持有的连接
+
+        各方法使用的连接在with块结束时关闭；内存库额外持有一个维持其生命周期的连接，
+        关闭后内存库随之销毁。重复调用是安全的。
+        """
+        if self._memory_keeper is not None:
+            self._memory_keeper.close()
+            self._memory_keeper = None
+
+    def clone(self) -> "SQLiteDataStore":
+        """
+        复制出一个独立的内存库副本
+
+        通过sqlite3的backup接口逐页复制表结构、索引和数据，不再重复执行建表和迁移；
+        测试中可用预置好用户的模板库为基线，快速得到互相隔离的数据库。
+
+        Returns:
+            新的内存SQLiteDataStore实例，修改互不影响原库
+        """
+        copy = object.__new__(type(self))
+        copy.db_path = ':memory:'
+        copy._durable = self._durable
+        copy._uri = False
+        copy._memory_uri = f"file:invoice_mgmt_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        copy._is_memory_db = True
+        copy._memory_keeper = sqlite3.connect(copy._memory_uri, uri=True, check_same_thread=False)
+        copy._configure_connection(copy._memory_keeper)
+        with self._get_connection() as source:
+            source.backup(copy._memory_keeper)
+        return copy
+
+    def __enter__(self) -> "SQLiteDataStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        self.close()
+        return False
+
     def _init_database(self) -> None:
         """创建数据库表结构和索引"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            if not self._is_memory_db:
-                cursor.execute("PRAGMA journal_mode=WAL")
-                cursor.execute("PRAGMA synchronous=NORMAL")
             
             # Create invoices table
             cursor.execute("""
@@ -132,6 +267,19 @@ class SQLiteDataStore:
             # Add record_type column if it doesn't exist
             self._migrate_add_record_type_column(cursor)
             
+            # Composite index for the list filters (uploader + record type + status)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_inv_uploader_type_status
+                ON invoices(uploaded_by, record_type, reimbursement_status)
+            """)
+            
+            # Partial index for check_manual_duplicate; only manual records are indexed
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_manual_dup
+                ON invoices(uploaded_by, invoice_date, amount, item_name)
+                WHERE record_type = 'manual'
+            """)
+            
             # Create expense_vouchers table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS expense_vouchers (
@@ -617,14 +765,27 @@ class SQLiteDataStore:
         Raises:
             sqlite3.IntegrityError: 发票号码重复时抛出
         """
+        self.insert_many([invoice])
+
+    def insert_many(self, invoices: List[Invoice]) -> None:
+        """
+        在单个事务中批量插入发票记录
+
+        Args:
+            invoices: 要插入的Invoice对象列表
+
+        Raises:
+            sqlite3.IntegrityError: 任一发票号码重复时抛出，整批回滚
+        """
+        if not invoices:
+            return
+
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            data = self.serialize_invoice(invoice)
-            cursor.execute("""
-                INSERT INTO invoices 
-                (invoice_number, invoice_date, item_name, amount, remark, file_path, scan_time, uploaded_by, reimbursement_person_id, reimbursement_status, record_type)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, data)
+            cursor.executemany(
+                self._INSERT_INVOICE_SQL,
+                [self.serialize_invoice(invoice) for invoice in invoices]
+            )
             conn.commit()
     
     def delete(self, invoice_number: str) -> bool:
@@ -692,6 +853,36 @@ class SQLiteDataStore:
             rows = cursor.fetchall()
             return [self.deserialize_invoice(row) for row in rows]
     
+    def iter_all(self, filters: Optional[Dict[str, Any]] = None) -> Iterator[Invoice]:
+        """
+        逐行迭代发票记录，不一次性加载全部结果，适用于大批量导出
+        
+        Args:
+            filters: 可选过滤条件，与query_invoices相同
+            
+        Yields:
+            Invoice对象，按录入顺序
+        """
+        where_sql, params = self._build_invoice_filters(filters)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # pdf_data is never needed here; select NULL in its slot to keep
+            # the row layout expected by deserialize_invoice
+            cursor.execute(
+                f"""
+                SELECT
+                    i.id, i.invoice_number, i.invoice_date, i.item_name, i.amount,
+                    i.remark, i.file_path, i.scan_time, NULL, i.uploaded_by,
+                    i.reimbursement_person_id, i.reimbursement_status, i.record_type
+                FROM invoices i
+                {where_sql}
+                ORDER BY i.id
+                """,
+                params
+            )
+            for row in cursor:
+                yield self.deserialize_invoice(row)
+    
     def search(self, keyword: str) -> List[Invoice]:
         """
         搜索发票记录，在所有文本字段中查找关键词
@@ -768,6 +959,11 @@ class SQLiteDataStore:
         where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
         return where_sql, params
 
+    @staticmethod
+    def _format_cents(cents: int) -> str:
+        """Format an integer amount in cents as a 2-decimal string."""
+        return str(Decimal(int(cents)).scaleb(-2))
+
     def query_invoices(
         self,
         filters: Optional[Dict[str, Any]] = None,
@@ -786,47 +982,54 @@ class SQLiteDataStore:
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
-            cursor.execute(f"SELECT COUNT(*) FROM invoices i {where_sql}", params)
-            total_count = int(cursor.fetchone()[0] or 0)
-            total_pages = (total_count + page_size - 1) // page_size if total_count else 0
-
+            # One grouped scan yields every aggregate; totals are derived by addition.
+            # Amounts are summed as integer cents so the totals stay exact.
             cursor.execute(
                 f"""
                 SELECT
-                    i.id, i.invoice_number, i.invoice_date, i.item_name, i.amount,
-                    i.remark, i.file_path, i.scan_time, i.pdf_data, i.uploaded_by,
-                    i.reimbursement_person_id, i.reimbursement_status, i.record_type,
-                    COALESCE(v.voucher_count, 0) AS voucher_count
+                    i.record_type, i.reimbursement_status, COUNT(*),
+                    COALESCE(SUM(CAST(ROUND(CAST(i.amount AS NUMERIC) * 100) AS BIGINT)), 0)
                 FROM invoices i
-                LEFT JOIN (
-                    SELECT invoice_number, COUNT(*) AS voucher_count
-                    FROM expense_vouchers
-                    GROUP BY invoice_number
-                ) v ON i.invoice_number = v.invoice_number
                 {where_sql}
-                ORDER BY i.scan_time DESC
-                LIMIT ? OFFSET ?
+                GROUP BY i.record_type, i.reimbursement_status
                 """,
-                params + [page_size, offset]
+                params
             )
-            rows = cursor.fetchall()
+            counts = {'invoice': 0, 'manual': 0, '未报销': 0, '已报销': 0}
+            amounts = {'invoice': 0, 'manual': 0}
+            total_count = 0
+            total_amount = 0
+            for record_type, status, count, amount in cursor.fetchall():
+                total_count += count
+                total_amount += amount
+                if record_type in amounts:
+                    counts[record_type] += count
+                    amounts[record_type] += amount
+                if status in counts:
+                    counts[status] += count
+            total_pages = (total_count + page_size - 1) // page_size if total_count else 0
 
+            # The page never needs pdf_data (NULL keeps the deserialize_invoice
+            # layout), and vouchers are counted per page row via idx_voucher_invoice
+            # instead of grouping the whole expense_vouchers table
             cursor.execute(
                 f"""
                 SELECT
-                    COALESCE(SUM(CAST(i.amount AS REAL)), 0) AS total_amount,
-                    COALESCE(SUM(CASE WHEN i.record_type = 'invoice' THEN 1 ELSE 0 END), 0) AS invoice_count,
-                    COALESCE(SUM(CASE WHEN i.record_type = 'manual' THEN 1 ELSE 0 END), 0) AS manual_count,
-                    COALESCE(SUM(CASE WHEN i.record_type = 'invoice' THEN CAST(i.amount AS REAL) ELSE 0 END), 0) AS invoice_amount,
-                    COALESCE(SUM(CASE WHEN i.record_type = 'manual' THEN CAST(i.amount AS REAL) ELSE 0 END), 0) AS manual_amount,
-                    COALESCE(SUM(CASE WHEN i.reimbursement_status = '未报销' THEN 1 ELSE 0 END), 0) AS pending_count,
-                    COALESCE(SUM(CASE WHEN i.reimbursement_status = '已报销' THEN 1 ELSE 0 END), 0) AS completed_count
+                    i.id, i.invoice_number, i.invoice_date, i.item_name, i.amount,
+                    i.remark, i.file_path, i.scan_time, NULL, i.uploaded_by,
+                    i.reimbursement_person_id, i.reimbursement_status, i.record_type,
+                    (
+                        SELECT COUNT(*) FROM expense_vouchers v
+                        WHERE v.invoice_number = i.invoice_number
+                    ) AS voucher_count
                 FROM invoices i
                 {where_sql}
+                ORDER BY i.scan_time DESC
+                LIMIT ? OFFSET ?
                 """,
-                params
+                params + [page_size, offset]
             )
-            stats_row = cursor.fetchone()
+            rows = cursor.fetchall()
 
         invoice_rows = []
         for row in rows:
@@ -841,13 +1044,13 @@ class SQLiteDataStore:
             'page': page,
             'page_size': page_size,
             'total_pages': total_pages,
-            'total_amount': str(Decimal(str(stats_row[0]))),
-            'invoice_count': int(stats_row[1] or 0),
-            'manual_count': int(stats_row[2] or 0),
-            'invoice_amount': str(Decimal(str(stats_row[3]))),
-            'manual_amount': str(Decimal(str(stats_row[4]))),
-            'pending_count': int(stats_row[5] or 0),
-            'completed_count': int(stats_row[6] or 0)
+            'total_amount': self._format_cents(total_amount),
+            'invoice_count': counts['invoice'],
+            'manual_count': counts['manual'],
+            'invoice_amount': self._format_cents(amounts['invoice']),
+            'manual_amount': self._format_cents(amounts['manual']),
+            'pending_count': counts['未报销'],
+            'completed_count': counts['已报销']
         }
     
     def insert_with_pdf(self, invoice: Invoice, pdf_data: bytes) -> None:
@@ -1023,6 +1226,42 @@ class SQLiteDataStore:
             conn.commit()
             return cursor.lastrowid
 
+    def insert_vouchers(self, vouchers: List[ExpenseVoucher]) -> List[int]:
+        """
+        在单个事务中批量插入同一发票的支出凭证记录
+
+        Args:
+            vouchers: 要插入的ExpenseVoucher对象列表（须关联同一发票号码）
+
+        Returns:
+            新插入记录的ID列表，顺序与输入一致
+
+        Raises:
+            ValueError: 凭证关联了不同的发票号码时抛出
+        """
+        if not vouchers:
+            return []
+
+        invoice_number = vouchers[0].invoice_number
+        if any(v.invoice_number != invoice_number for v in vouchers):
+            raise ValueError("批量插入的凭证必须关联同一发票")
+
+        # 逐行插入并读取lastrowid（PostgreSQL适配层会改写为RETURNING id），
+        # 不依赖数据库的写锁语义，并发上传同一发票的凭证时ID也不会错配；
+        # 所有行仍在同一事务中提交
+        ids = []
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for voucher in vouchers:
+                cursor.execute("""
+                    INSERT INTO expense_vouchers
+                    (invoice_number, file_path, original_filename, upload_time)
+                    VALUES (?, ?, ?, ?)
+                """, self.serialize_voucher(voucher))
+                ids.append(cursor.lastrowid)
+            conn.commit()
+        return ids
+
     def get_vouchers_by_invoice(self, invoice_number: str) -> List[ExpenseVoucher]:
         """
         获取指定发票的所有支出凭证
@@ -1833,14 +2072,10 @@ class SQLiteDataStore:
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM invoices 
-                WHERE amount = ?
-                  AND invoice_date = ?
-                  AND item_name = ?
-                  AND uploaded_by = ?
-                  AND record_type = 'manual'
-            """, (str(amount), invoice_date, item_name, uploaded_by))
+            cursor.execute(
+                self._MANUAL_DUPLICATE_SQL,
+                (str(amount), invoice_date, item_name, uploaded_by)
+            )
             
             row = cursor.fetchone()
             if row:
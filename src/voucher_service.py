@@ -6,7 +6,7 @@ VoucherService for expense voucher management.
 import os
 import uuid
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from src.models import ExpenseVoucher
 from src.sqlite_data_store import SQLiteDataStore
@@ -118,7 +118,53 @@ class VoucherService:
         voucher.id = voucher_id
         
         return voucher
-    
+
+    def add_vouchers_bulk(self, invoice_number: str, files: List[Tuple[bytes, str]]) -> List[ExpenseVoucher]:
+        """
+        批量添加支出凭证（先写入全部文件，再在单个事务中插入数据库记录）
+
+        格式校验统一在此进行：不支持的格式直接跳过，不写文件也不入库
+
+        Args:
+            invoice_number: 关联的发票号码
+            files: (文件二进制数据, 原始文件名) 元组列表
+
+        Returns:
+            创建的ExpenseVoucher对象列表，顺序与有效文件的输入顺序一致
+        """
+        files = [(file_data, filename) for file_data, filename in files if self.validate_file_format(filename)]
+        if not files:
+            return []
+
+        voucher_path = self._ensure_voucher_dir(invoice_number)
+        upload_time = datetime.now()
+        vouchers = []
+
+        for file_data, filename in files:
+            file_path = os.path.join(voucher_path, self._generate_unique_filename(filename))
+            with open(file_path, 'wb') as f:
+                f.write(file_data)
+            vouchers.append(ExpenseVoucher(
+                id=None,
+                invoice_number=invoice_number,
+                file_path=file_path,
+                original_filename=filename,
+                upload_time=upload_time
+            ))
+
+        try:
+            voucher_ids = self.data_store.insert_vouchers(vouchers)
+        except Exception:
+            # 数据库记录整批回滚，已写入的文件也一并删除，避免残留孤立文件
+            for voucher in vouchers:
+                if os.path.exists(voucher.file_path):
+                    os.remove(voucher.file_path)
+            raise
+        for voucher, voucher_id in zip(vouchers, voucher_ids):
+            voucher.id = voucher_id
+
+        return vouchers
+
     def get_vouchers(self, invoice_number: str) -> List[ExpenseVoucher]:
         """
         获取指定发票的所有支出凭证
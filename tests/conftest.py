@@ -0,0 +1,92 @@
+"""
+测试公共夹具
+整个测试会话共享一个内存数据库和Flask应用，表结构与迁移只执行一次；
+每个测试结束后清空业务数据表，保证用例之间相互隔离。
+"""
+
+import os
+
+import pytest
+
+from src.sqlite_data_store import SQLiteDataStore
+from tests.helpers import login_as, make_test_app, read_static_files
+
+
+# 具名共享缓存内存库：不落盘，同一进程内按URI打开的连接都指向同一份数据；
+# 库名带上pytest-xdist的worker编号，并行运行（pytest -n auto）时各worker互不干扰
+_TEST_DB_URI = f"file:invoice_tests_{os.environ.get('PYTEST_XDIST_WORKER', 'gw0')}?mode=memory&cache=shared"
+
+# 测试会写入的业务表（子表在前，满足外键约束）
+_DATA_TABLES = ('expense_vouchers', 'invoices')
+
+
+@pytest.fixture(scope="session")
+def data_store():
+    """会话级共享的内存数据库，预置普通用户和管理员；会话结束时关闭并释放内存库"""
+    with SQLiteDataStore(_TEST_DB_URI, uri=True) as store:
+        store.create_user('testuser', 'password123', '测试用户')
+        store.create_user('admin', 'admin123', '管理员', is_admin=True)
+        yield store
+
+
+@pytest.fixture(scope="session")
+def template_data_store():
+    """会话内只建表一次的模板库，预置用户与data_store相同"""
+    with SQLiteDataStore(':memory:', durable=False) as store:
+        store.create_user('testuser', 'password123', '测试用户')
+        store.create_user('admin', 'admin123', '管理员', is_admin=True)
+        yield store
+
+
+@pytest.fixture
+def fresh_data_store(template_data_store):
+    """每个测试独占的内存库，由模板库复制而来，需要独立应用实例的测试使用"""
+    with template_data_store.clone() as store:
+        yield store
+
+
+@pytest.fixture(scope="session")
+def app(data_store):
+    """会话级共享的测试应用"""
+    return make_test_app(data_store)
+
+
+@pytest.fixture(scope="session")
+def static_files():
+    """会话内只读取一次的模板和静态资源内容，键为相对项目根目录的路径"""
+    return read_static_files()
+
+
+@pytest.fixture
+def clean_data_store(data_store):
+    """测试结束后清空业务数据，保留表结构和预置用户"""
+    yield data_store
+    with data_store._get_connection() as conn:
+        for table in _DATA_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+
+
+@pytest.fixture(scope="session")
+def _shared_client(app):
+    """会话内复用的测试客户端"""
+    return app.test_client()
+
+
+@pytest.fixture
+def client(app, _shared_client, clean_data_store):
+    """测试客户端，测试结束后删除会话Cookie，下一个测试以未登录状态开始"""
+    yield _shared_client
+    _shared_client.delete_cookie(app.config['SESSION_COOKIE_NAME'])
+
+
+@pytest.fixture
+def logged_in_user_client(client, data_store):
+    """以普通用户身份登录的测试客户端"""
+    return login_as(client, data_store, 'testuser')
+
+
+@pytest.fixture
+def logged_in_admin_client(client, data_store):
+    """以管理员身份登录的测试客户端"""
+    return login_as(client, data_store, 'admin')
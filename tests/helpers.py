@@ -0,0 +1,164 @@
+"""
+测试辅助函数
+"""
+
+import re
+from dataclasses import replace
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+from typing import AnyStr, BinaryIO, Dict, Iterable, List, Set, Tuple, Union
+
+from openpyxl import load_workbook
+
+from invoice_web.app import create_app
+from src.models import Invoice
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 测试中按源码检查的模板和静态资源（相对项目根目录）
+STATIC_FILES = (
+    'invoice_web/templates/index.html',
+    'invoice_web/templates/user/upload.html',
+    'invoice_web/templates/user/_mode_selector.html',
+    'invoice_web/templates/user/invoices.html',
+    'invoice_web/templates/user/detail.html',
+    'invoice_web/static/css/style.css',
+    'invoice_web/static/js/app.js',
+    'invoice_web/static/js/user_app.js',
+)
+
+# 测试记录模板，批量造数时只替换有差异的字段
+_INVOICE_TEMPLATE = Invoice(
+    invoice_number='',
+    invoice_date='2025-12-28',
+    item_name='',
+    amount=Decimal('0'),
+    remark='',
+    file_path='',
+    scan_time=datetime.now(),
+    uploaded_by='测试用户',
+    record_type='invoice'
+)
+
+
+@lru_cache(maxsize=None)
+def _needle_pattern(needles: Tuple[AnyStr, ...]) -> "re.Pattern":
+    # 长串优先，避免短串抢先匹配吞掉包含它的长串
+    ordered = sorted(needles, key=len, reverse=True)
+    separator = b'|' if isinstance(ordered[0], bytes) else '|'
+    return re.compile(separator.join(map(re.escape, ordered)))
+
+
+def missing_substrings(text: AnyStr, needles: Iterable[AnyStr]) -> Set[AnyStr]:
+    """
+    单次扫描文本，返回未出现在其中的子串集合
+
+    Args:
+        text: 待检查的文本（HTML/CSS/JS内容），str或bytes均可
+        needles: 期望出现的子串，类型须与text一致
+
+    Returns:
+        未找到的子串集合，全部存在时为空集合
+    """
+    needles = tuple(dict.fromkeys(needles))
+    found = set(_needle_pattern(needles).findall(text))
+    # 相互重叠的子串可能被一次匹配吞掉，对少量未命中者再逐个确认
+    return {needle for needle in needles if needle not in found and needle not in text}
+
+
+def make_invoice(n: int, record_type: str, amount: Decimal, **overrides) -> Invoice:
+    """
+    基于模板构造测试用发票/无票报销记录
+
+    Args:
+        n: 序号，用于生成唯一的记录编号和项目名称
+        record_type: 记录类型（invoice | manual）
+        amount: 金额
+        **overrides: 需要覆盖的其他字段
+
+    Returns:
+        Invoice对象
+    """
+    is_invoice = record_type == 'invoice'
+    return replace(
+        _INVOICE_TEMPLATE,
+        invoice_number=f"{'INV' if is_invoice else 'MANUAL'}{n:04d}",
+        item_name=f"{'发票项目' if is_invoice else '手动项目'}{n}",
+        amount=amount,
+        file_path='test.pdf' if is_invoice else 'MANUAL',
+        record_type=record_type,
+        **overrides
+    )
+
+
+def make_test_app(data_store, secret_key: str = 'test-secret-key'):
+    """
+    创建测试用Flask应用
+
+    开启TESTING使视图异常直接抛给测试，并关闭应用日志，避免断言错误分支时格式化无用日志
+
+    Args:
+        data_store: 应用使用的数据存储
+        secret_key: 会话签名密钥
+
+    Returns:
+        配置好的Flask应用实例
+    """
+    app = create_app(data_store)
+    app.config['TESTING'] = True
+    app.config['SECRET_KEY'] = secret_key
+    app.logger.disabled = True
+    return app
+
+
+def login_as(client, data_store, username: str):
+    """
+    直接写入会话登录，跳过登录接口的密码校验（登录接口本身由专门的用例覆盖）
+
+    Args:
+        client: Flask测试客户端
+        data_store: 用户所在的数据存储
+        username: 已存在的用户名
+
+    Returns:
+        已登录的测试客户端
+    """
+    user = data_store.get_user_by_username(username)
+    with client.session_transaction() as sess:
+        sess['user'] = {
+            'username': user.username,
+            'display_name': user.display_name,
+            'is_admin': user.is_admin
+        }
+    return client
+
+
+def read_exported_rows(source: Union[str, BinaryIO]) -> List[tuple]:
+    """
+    以只读模式读取导出的Excel，返回活动工作表全部行的值
+
+    Args:
+        source: Excel文件路径或已定位到开头的二进制文件对象
+
+    Returns:
+        每行单元格值组成的元组列表，行、列下标均从0开始（空行为空元组）
+    """
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        return list(wb.active.iter_rows(values_only=True))
+    finally:
+        # 只读模式保持文件句柄打开，需显式关闭
+        wb.close()
+
+
+def read_static_files() -> Dict[str, str]:
+    """
+    读取STATIC_FILES中的全部文件
+
+    Returns:
+        相对路径 -> 文件内容 的字典
+    """
+    return {path: (PROJECT_ROOT / path).read_text(encoding='utf-8') for path in STATIC_FILES}
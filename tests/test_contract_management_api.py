@@ -1,46 +1,44 @@
-import os
-import tempfile
 from datetime import datetime
 from decimal import Decimal
 from io import BytesIO
 
 import pytest
 
-from invoice_web.app import create_app
 from src.models import Invoice
-from src.sqlite_data_store import SQLiteDataStore
+from tests.helpers import login_as, make_test_app
 
 
-@pytest.fixture
-def data_store():
-    fd, db_path = tempfile.mkstemp(suffix='.db')
-    os.close(fd)
-    store = SQLiteDataStore(db_path)
-    store.create_user('admin', 'admin123', 'Admin', is_admin=True)
+def _insert_invoices(data_store, invoice_numbers, item_name, amount, remark):
+    """以单个批量事务写入同一批测试发票"""
+    scan_time = datetime.now()
+    data_store.insert_many(
+        Invoice(
+            invoice_number=invoice_number,
+            invoice_date='2026-03-10',
+            item_name=item_name,
+            amount=Decimal(amount),
+            remark=remark,
+            file_path='MEMORY',
+            scan_time=scan_time,
+            uploaded_by='Admin'
+        )
+        for invoice_number in invoice_numbers
+    )
 
-    yield store
 
-    try:
-        os.remove(db_path)
-    except OSError:
-        pass
+@pytest.fixture
+def data_store(fresh_data_store):
+    return fresh_data_store
 
 
 @pytest.fixture
 def client(data_store):
-    app = create_app(data_store)
-    app.config['TESTING'] = True
-    app.config['SECRET_KEY'] = 'test-secret'
-    return app.test_client()
+    return make_test_app(data_store).test_client()
 
 
 @pytest.fixture
-def admin_client(client):
-    resp = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
-    assert resp.status_code == 200
-    data = resp.get_json()
-    assert data['success'] is True
-    return client
+def admin_client(client, data_store):
+    return login_as(client, data_store, 'admin')
 
 
 def test_contract_management_crud_flow(admin_client):
@@ -158,19 +156,9 @@ def test_contract_upload_accepts_manual_title(admin_client):
 
 def test_contract_pairing_requires_existing_invoices(admin_client, data_store):
     invoice_numbers = ['INV-P-001', 'INV-P-002']
+    _insert_invoices(data_store, invoice_numbers, 'Pairing Test', '100.00', 'pairing')
     for invoice_number in invoice_numbers:
-        invoice = Invoice(
-            invoice_number=invoice_number,
-            invoice_date='2026-03-10',
-            item_name='Pairing Test',
-            amount=Decimal('100.00'),
-            remark='pairing',
-            file_path='MEMORY',
-            scan_time=datetime.now(),
-            uploaded_by='Admin'
-        )
-        data_store.insert(invoice)
-        data_store.update_pdf_data(invoice.invoice_number, b'%PDF-1.4 test invoice')
+        data_store.update_pdf_data(invoice_number, b'%PDF-1.4 test invoice')
 
     pdf_bytes = b'%PDF-1.4\n%pair-contract\n1 0 obj\n<<>>\nendobj\n'
     upload_resp = admin_client.post(
@@ -236,18 +224,7 @@ def test_contract_invoice_validation_endpoint_returns_found_and_missing(admin_cl
 
 
 def test_contract_list_search_matches_linked_invoice_numbers(admin_client, data_store):
-    for invoice_number in ['INV-LINK-001', 'INV-LINK-002']:
-        invoice = Invoice(
-            invoice_number=invoice_number,
-            invoice_date='2026-03-10',
-            item_name='Linked Search Test',
-            amount=Decimal('120.00'),
-            remark='linked-search',
-            file_path='MEMORY',
-            scan_time=datetime.now(),
-            uploaded_by='Admin'
-        )
-        data_store.insert(invoice)
+    _insert_invoices(data_store, ['INV-LINK-001', 'INV-LINK-002'], 'Linked Search Test', '120.00', 'linked-search')
 
     pdf_bytes = b'%PDF-1.4\n%linked-search\n1 0 obj\n<<>>\nendobj\n'
     upload_resp = admin_client.post(
@@ -277,18 +254,7 @@ def test_contract_list_search_matches_linked_invoice_numbers(admin_client, data_
 
 
 def test_invoice_related_contracts_endpoint_returns_candidate_and_linked_matches(admin_client, data_store):
-    for invoice_number in ['INV-REL-001', 'INV-REL-002']:
-        invoice = Invoice(
-            invoice_number=invoice_number,
-            invoice_date='2026-03-10',
-            item_name='Related Contract Test',
-            amount=Decimal('66.00'),
-            remark='related-contract',
-            file_path='MEMORY',
-            scan_time=datetime.now(),
-            uploaded_by='Admin'
-        )
-        data_store.insert(invoice)
+    _insert_invoices(data_store, ['INV-REL-001', 'INV-REL-002'], 'Related Contract Test', '66.00', 'related-contract')
 
     pdf_bytes = b'%PDF-1.4\n%related-contract\n1 0 obj\n<<>>\nendobj\n'
     upload_resp = admin_client.post(
@@ -3,81 +3,33 @@
 测试完整的用户工作流和混合场景
 """
 import pytest
-import os
-import tempfile
-import shutil
-from datetime import datetime
-from decimal import Decimal
 from io import BytesIO
 
-from src.sqlite_data_store import SQLiteDataStore
-from src.models import Invoice
-from invoice_web.app import create_app
+from tests.helpers import login_as, make_test_app
 
 
 @pytest.fixture
-def test_db_path():
-    """创建临时测试数据库"""
-    fd, path = tempfile.mkstemp(suffix='.db')
-    os.close(fd)
-    yield path
-    if os.path.exists(path):
-        try:
-            os.remove(path)
-        except:
-            pass
-
-
-@pytest.fixture
-def test_data_dir():
-    """创建临时数据目录"""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    if os.path.exists(temp_dir):
-        try:
-            shutil.rmtree(temp_dir)
-        except:
-            pass
-
-
-@pytest.fixture
-def data_store(test_db_path):
-    """创建测试数据存储"""
-    ds = SQLiteDataStore(test_db_path)
-    # 创建测试用户
-    ds.create_user('testuser', 'password123', '测试用户')
-    yield ds
-    del ds
+def data_store(fresh_data_store):
+    """每个测试独立的数据存储，由预置了测试用户的模板库复制而来"""
+    return fresh_data_store
 
 
 @pytest.fixture
 def app(data_store):
     """创建测试应用"""
-    app = create_app(data_store)
-    app.config['TESTING'] = True
-    return app
+    return make_test_app(data_store)
 
 
 @pytest.fixture
 def client(app):
     """创建测试客户端"""
-    # Enable session support for test client
-    app.config['SECRET_KEY'] = 'test-secret-key'
     return app.test_client()
 
 
 @pytest.fixture
-def authenticated_client(client):
+def authenticated_client(client, data_store):
     """创建已认证的测试客户端"""
-    # 使用JSON格式登录
-    response = client.post('/user/api/login', json={
-        'username': 'testuser',
-        'password': 'password123'
-    })
-    assert response.status_code == 200
-    result = response.get_json()
-    assert result['success'] is True
-    return client
+    return login_as(client, data_store, 'testuser')
 
 
 def create_test_image():
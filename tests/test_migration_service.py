@@ -0,0 +1,51 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.data_store import DataStore
+from src.migration_service import MigrationService
+from src.models import Invoice
+from src.sqlite_data_store import SQLiteDataStore
+
+
+def _invoice(invoice_number):
+    return Invoice(
+        invoice_number=invoice_number,
+        invoice_date="2025-12-28",
+        item_name="办公用品",
+        amount=Decimal("10.00"),
+        remark="",
+        file_path="test.pdf",
+        scan_time=datetime.now(),
+    )
+
+
+def test_migrate_inserts_batch_and_skips_existing_invoices(tmp_path):
+    DataStore(data_dir=str(tmp_path), file_name="invoices.json").save(
+        [_invoice("INV-1"), _invoice("INV-2"), _invoice("INV-3")]
+    )
+    sqlite_store = SQLiteDataStore(":memory:")
+    service = MigrationService(json_path=str(tmp_path / "invoices.json"), sqlite_store=sqlite_store)
+
+    assert service.migrate() == (3, 0, [])
+
+    # 再次迁移时整批因重复回滚，逐条插入：缺失的记录补回，其余计为跳过
+    sqlite_store.delete("INV-2")
+    assert service.migrate() == (1, 2, [])
+    assert sorted(inv.invoice_number for inv in sqlite_store.load_all()) == ["INV-1", "INV-2", "INV-3"]
+
+
+def test_migrate_propagates_non_integrity_errors(tmp_path, monkeypatch):
+    DataStore(data_dir=str(tmp_path), file_name="invoices.json").save([_invoice("INV-1")])
+    sqlite_store = SQLiteDataStore(":memory:")
+    service = MigrationService(json_path=str(tmp_path / "invoices.json"), sqlite_store=sqlite_store)
+
+    def broken_insert_many(invoices):
+        raise TypeError("serialization failed")
+
+    monkeypatch.setattr(sqlite_store, "insert_many", broken_insert_many)
+
+    with pytest.raises(TypeError):
+        service.migrate()
+    assert sqlite_store.load_all() == []
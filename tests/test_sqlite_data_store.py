@@ -0,0 +1,243 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.models import ExpenseVoucher, Invoice
+from src.sqlite_data_store import SQLiteDataStore
+
+
+def _pragma(data_store, name):
+    with data_store._get_connection() as conn:
+        return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def test_file_database_uses_wal_with_normal_sync(tmp_path):
+    data_store = SQLiteDataStore(str(tmp_path / "wal.db"))
+
+    assert _pragma(data_store, "journal_mode") == "wal"
+    # 1 == NORMAL; must hold on every new connection, not just the first one
+    assert _pragma(data_store, "synchronous") == 1
+    # 2 == MEMORY
+    assert _pragma(data_store, "temp_store") == 2
+
+
+def test_non_durable_database_skips_journal_file_and_fsync(tmp_path):
+    data_store = SQLiteDataStore(str(tmp_path / "fast.db"), durable=False)
+
+    assert _pragma(data_store, "journal_mode") == "memory"
+    assert _pragma(data_store, "synchronous") == 0
+
+
+def test_durable_store_enables_wal_after_non_durable_open(tmp_path):
+    db_path = str(tmp_path / "mixed.db")
+    SQLiteDataStore(db_path, durable=False)
+
+    # 迁移结果已按文件缓存，持久模式实例仍须切换到WAL
+    assert _pragma(SQLiteDataStore(db_path), "journal_mode") == "wal"
+
+
+def _invoice(invoice_number):
+    return Invoice(
+        invoice_number=invoice_number,
+        invoice_date="2025-12-28",
+        item_name="办公用品",
+        amount=Decimal("10.00"),
+        remark="",
+        file_path="test.pdf",
+        scan_time=datetime.now(),
+    )
+
+
+def test_insert_many_rolls_back_whole_batch_on_duplicate():
+    data_store = SQLiteDataStore(":memory:")
+    data_store.insert(_invoice("INV-1"))
+
+    with pytest.raises(sqlite3.IntegrityError):
+        data_store.insert_many([_invoice("INV-2"), _invoice("INV-1")])
+
+    assert [inv.invoice_number for inv in data_store.load_all()] == ["INV-1"]
+
+
+def test_list_filters_use_composite_index():
+    data_store = SQLiteDataStore(":memory:")
+    where_sql, params = data_store._build_invoice_filters(
+        {"uploaded_by": "管理员", "record_type": "manual", "reimbursement_status": "已报销"}
+    )
+
+    with data_store._get_connection() as conn:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN SELECT COUNT(*) FROM invoices i {where_sql}", params).fetchall()
+
+    assert "idx_inv_uploader_type_status" in plan[0][3]
+
+
+def test_record_type_filter_is_whitelisted_and_indexed():
+    data_store = SQLiteDataStore(":memory:")
+
+    assert data_store._build_invoice_filters({"record_type": "manual' OR '1'='1"}) == ("", [])
+
+    where_sql, params = data_store._build_invoice_filters({"record_type": "manual"})
+    assert params == ["manual"]
+    with data_store._get_connection() as conn:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN SELECT COUNT(*) FROM invoices i {where_sql}", params).fetchall()
+
+    assert "idx_record_type" in plan[0][3]
+
+
+def test_manual_duplicate_check_uses_partial_index():
+    data_store = SQLiteDataStore(":memory:")
+
+    with data_store._get_connection() as conn:
+        plan = conn.execute(
+            f"EXPLAIN QUERY PLAN {SQLiteDataStore._MANUAL_DUPLICATE_SQL}",
+            ("50.00", "2025-12-28", "交通费", "张三"),
+        ).fetchall()
+
+    assert "USING INDEX idx_manual_dup" in plan[0][3]
+
+
+def test_shared_memory_uri_is_visible_to_every_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    uri = "file:test_shared_uri?mode=memory&cache=shared"
+    writer = SQLiteDataStore(uri, uri=True)
+    writer.insert(_invoice("INV-SHARED"))
+
+    reader = SQLiteDataStore(uri, uri=True)
+
+    assert [inv.invoice_number for inv in reader.load_all()] == ["INV-SHARED"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_query_invoices_sums_amounts_exactly():
+    data_store = SQLiteDataStore(":memory:")
+    scan_time = datetime.now()
+    data_store.insert_many([
+        Invoice(
+            invoice_number=f"INV-{i}",
+            invoice_date="2025-12-28",
+            item_name="办公用品",
+            amount=amount,
+            remark="",
+            file_path="test.pdf",
+            scan_time=scan_time,
+            record_type=record_type,
+        )
+        for i, (amount, record_type) in enumerate([
+            (Decimal("0.10"), "invoice"),
+            (Decimal("0.20"), "invoice"),
+            (Decimal("0.3"), "manual"),
+        ])
+    ])
+
+    result = data_store.query_invoices()
+
+    assert result["invoice_amount"] == "0.30"
+    assert result["manual_amount"] == "0.30"
+    assert result["total_amount"] == "0.60"
+
+
+def test_query_invoices_sums_amounts_beyond_32_bit_cents():
+    # 单条金额超过21,474,836.47时分值超出32位整数（PostgreSQL的INTEGER）范围
+    data_store = SQLiteDataStore(":memory:")
+    invoices = [_invoice("INV-1"), _invoice("INV-2")]
+    invoices[0].amount = Decimal("98765432.10")
+    invoices[1].amount = Decimal("21474836.48")
+    data_store.insert_many(invoices)
+
+    result = data_store.query_invoices()
+
+    assert result["invoice_amount"] == "120240268.58"
+    assert result["total_amount"] == "120240268.58"
+
+
+def test_file_database_is_migrated_once_per_process(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "migrated.db")
+    SQLiteDataStore(db_path)
+    calls = []
+    monkeypatch.setattr(SQLiteDataStore, "_init_database", lambda self: calls.append(self.db_path))
+
+    SQLiteDataStore(db_path)
+    assert calls == []
+
+    # 文件被删除重建后schema_version不再匹配，需要重新迁移
+    os.remove(db_path)
+    open(db_path, "wb").close()
+    SQLiteDataStore(db_path)
+    assert calls == [db_path]
+
+
+def test_iter_all_streams_filtered_rows_in_insert_order():
+    data_store = SQLiteDataStore(":memory:")
+    invoices = [_invoice(f"INV-{i}") for i in range(3)]
+    invoices[1].record_type = "manual"
+    data_store.insert_many(invoices)
+
+    rows = data_store.iter_all()
+
+    assert not isinstance(rows, list)
+    assert [inv.invoice_number for inv in rows] == ["INV-0", "INV-1", "INV-2"]
+    assert [inv.invoice_number for inv in data_store.iter_all({"record_type": "manual"})] == ["INV-1"]
+
+
+def test_query_invoices_counts_vouchers_per_page_row():
+    data_store = SQLiteDataStore(":memory:")
+    data_store.insert_many([_invoice("INV-1"), _invoice("INV-2")])
+    upload_time = datetime.now()
+    data_store.insert_vouchers([
+        ExpenseVoucher(id=None, invoice_number="INV-1", file_path=f"v{i}.jpg",
+                       original_filename=f"v{i}.jpg", upload_time=upload_time)
+        for i in range(2)
+    ])
+
+    rows = data_store.query_invoices()["invoices"]
+
+    assert {row["invoice"].invoice_number: row["voucher_count"] for row in rows} == {"INV-1": 2, "INV-2": 0}
+
+
+def test_context_manager_releases_memory_database():
+    with SQLiteDataStore(":memory:") as data_store:
+        data_store.insert(_invoice("INV-1"))
+        memory_uri = data_store._memory_uri
+
+    assert data_store._memory_keeper is None
+    # 最后一个连接关闭后共享内存库被销毁，按同一URI重新打开得到的是空库
+    conn = sqlite3.connect(memory_uri, uri=True)
+    try:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'invoices'").fetchone() is None
+    finally:
+        conn.close()
+    data_store.close()
+
+
+def test_memory_database_is_shared_across_threads():
+    data_store = SQLiteDataStore(":memory:")
+    errors = []
+
+    def insert():
+        try:
+            data_store.insert(_invoice("INV-THREAD"))
+        except Exception as exc:
+            errors.append(exc)
+
+    worker = threading.Thread(target=insert)
+    worker.start()
+    worker.join()
+
+    assert errors == []
+    assert [inv.invoice_number for inv in data_store.load_all()] == ["INV-THREAD"]
+
+
+def test_clone_copies_schema_and_data_without_sharing_them():
+    with SQLiteDataStore(":memory:") as template:
+        template.create_user("admin", "admin123", "管理员", is_admin=True)
+        template.insert(_invoice("INV-1"))
+
+        with template.clone() as copy:
+            copy.insert(_invoice("INV-2"))
+
+            assert copy.get_user_by_username("admin").is_admin
+            assert [inv.invoice_number for inv in copy.load_all()] == ["INV-1", "INV-2"]
+            assert [inv.invoice_number for inv in template.load_all()] == ["INV-1"]
@@ -3,106 +3,59 @@
 验证发票列表页面显示分类统计（有发票记录和无发票记录的数量和金额）
 """
 
-import pytest
 from decimal import Decimal
-from datetime import datetime
-from src.models import Invoice
-from src.sqlite_data_store import SQLiteDataStore
-from invoice_web.app import create_app
-
-
-@pytest.fixture
-def app():
-    """创建测试应用"""
-    # 使用内存数据库
-    data_store = SQLiteDataStore(':memory:')
-    
-    # 创建测试用户
-    data_store.create_user('testuser', 'password123', '测试用户')
-    
-    # 创建应用并传入测试数据库
-    app = create_app(data_store)
-    app.config['TESTING'] = True
-    app.config['SECRET_KEY'] = 'test-secret-key'
-    
-    yield app
-
-
-@pytest.fixture
-def client(app):
-    """创建测试客户端"""
-    return app.test_client()
-
-
-@pytest.fixture
-def logged_in_client(client):
-    """创建已登录的测试客户端"""
-    # 登录
-    client.post('/user/api/login', json={
+from tests.helpers import make_invoice, missing_substrings
+
+
+_STATISTICS_ELEMENTS = tuple(needle.encode('utf-8') for needle in (
+    # 总计统计元素
+    'id="total-count"',
+    'id="total-amount"',
+    # 分类统计元素
+    'id="invoice-count"',
+    'id="manual-count"',
+    'id="invoice-amount"',
+    'id="manual-amount"',
+    # 显示文本
+    '有发票记录',
+    '无发票记录',
+))
+
+
+def test_user_login_sets_session(client):
+    """测试普通用户通过登录接口登录"""
+    response = client.post('/user/api/login', json={
         'username': 'testuser',
         'password': 'password123'
     })
-    return client
+    assert response.status_code == 200
+    assert response.get_json()['user']['display_name'] == '测试用户'
+    
+    response = client.get('/user/api/invoices')
+    assert response.status_code == 200
 
 
-def test_invoices_page_has_statistics_elements(logged_in_client):
+def test_invoices_page_has_statistics_elements(logged_in_user_client):
     """测试发票列表页面包含统计显示元素"""
-    response = logged_in_client.get('/user/invoices')
+    response = logged_in_user_client.get('/user/invoices')
     assert response.status_code == 200
     
-    html = response.data.decode('utf-8')
-    
-    # 验证总计统计元素存在
-    assert 'id="total-count"' in html
-    assert 'id="total-amount"' in html
-    
-    # 验证分类统计元素存在
-    assert 'id="invoice-count"' in html
-    assert 'id="manual-count"' in html
-    assert 'id="invoice-amount"' in html
-    assert 'id="manual-amount"' in html
-    
-    # 验证显示文本
-    assert '有发票记录' in html
-    assert '无发票记录' in html
+    # 直接在响应字节上检查，无需整页解码
+    assert not missing_substrings(response.data, _STATISTICS_ELEMENTS)
 
 
-def test_api_returns_categorized_statistics(logged_in_client, app):
+def test_api_returns_categorized_statistics(logged_in_user_client, app):
     """测试API返回分类统计数据"""
     data_store = app.config['data_store']
     
     # 创建2个发票记录
-    for i in range(2):
-        invoice = Invoice(
-            invoice_number=f'INV00{i+1}',
-            invoice_date='2025-12-28',
-            item_name=f'发票项目{i+1}',
-            amount=Decimal('100.00'),
-            remark='',
-            file_path='test.pdf',
-            scan_time=datetime.now(),
-            uploaded_by='测试用户',
-            record_type='invoice'
-        )
-        data_store.insert(invoice)
+    data_store.insert_many([make_invoice(i, 'invoice', Decimal('100.00')) for i in range(2)])
     
     # 创建3个手动记录
-    for i in range(3):
-        manual = Invoice(
-            invoice_number=f'MANUAL-00{i+1}',
-            invoice_date='2025-12-28',
-            item_name=f'手动项目{i+1}',
-            amount=Decimal('50.00'),
-            remark='',
-            file_path='MANUAL',
-            scan_time=datetime.now(),
-            uploaded_by='测试用户',
-            record_type='manual'
-        )
-        data_store.insert(manual)
+    data_store.insert_many([make_invoice(i, 'manual', Decimal('50.00')) for i in range(3)])
     
     # 获取发票列表
-    response = logged_in_client.get('/user/api/invoices')
+    response = logged_in_user_client.get('/user/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -116,7 +69,7 @@ def test_api_returns_categorized_statistics(logged_in_client, app):
     assert Decimal(data['manual_amount']) == Decimal('150.00')  # 3*50
 
 
-def test_statistics_aggregation_property(logged_in_client, app):
+def test_statistics_aggregation_property(logged_in_user_client, app):
     """
     Property 17: Statistics Aggregation
     验证总计数等于两种类型的计数之和，总金额等于两种类型的金额之和
@@ -131,37 +84,13 @@ def test_statistics_aggregation_property(logged_in_client, app):
     manual_amount_each = Decimal('75.25')
     
     # 创建发票记录
-    for i in range(invoice_count):
-        invoice = Invoice(
-            invoice_number=f'INV{i:04d}',
-            invoice_date='2025-12-28',
-            item_name=f'发票项目{i+1}',
-            amount=invoice_amount_each,
-            remark='',
-            file_path='test.pdf',
-            scan_time=datetime.now(),
-            uploaded_by='测试用户',
-            record_type='invoice'
-        )
-        data_store.insert(invoice)
+    data_store.insert_many([make_invoice(i, 'invoice', invoice_amount_each) for i in range(invoice_count)])
     
     # 创建手动记录
-    for i in range(manual_count):
-        manual = Invoice(
-            invoice_number=f'MANUAL{i:04d}',
-            invoice_date='2025-12-28',
-            item_name=f'手动项目{i+1}',
-            amount=manual_amount_each,
-            remark='',
-            file_path='MANUAL',
-            scan_time=datetime.now(),
-            uploaded_by='测试用户',
-            record_type='manual'
-        )
-        data_store.insert(manual)
+    data_store.insert_many([make_invoice(i, 'manual', manual_amount_each) for i in range(manual_count)])
     
     # 获取统计数据
-    response = logged_in_client.get('/user/api/invoices')
+    response = logged_in_user_client.get('/user/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -182,9 +111,9 @@ def test_statistics_aggregation_property(logged_in_client, app):
     assert Decimal(data['manual_amount']) == manual_amount_each * manual_count
 
 
-def test_empty_statistics(logged_in_client, app):
+def test_empty_statistics(logged_in_user_client, app):
     """测试没有记录时的统计显示"""
-    response = logged_in_client.get('/user/api/invoices')
+    response = logged_in_user_client.get('/user/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -198,26 +127,14 @@ def test_empty_statistics(logged_in_client, app):
     assert Decimal(data['manual_amount']) == Decimal('0')
 
 
-def test_only_invoice_records_statistics(logged_in_client, app):
+def test_only_invoice_records_statistics(logged_in_user_client, app):
     """测试只有发票记录时的统计"""
     data_store = app.config['data_store']
     
     # 只创建发票记录
-    for i in range(3):
-        invoice = Invoice(
-            invoice_number=f'INV00{i+1}',
-            invoice_date='2025-12-28',
-            item_name=f'发票项目{i+1}',
-            amount=Decimal('100.00'),
-            remark='',
-            file_path='test.pdf',
-            scan_time=datetime.now(),
-            uploaded_by='测试用户',
-            record_type='invoice'
-        )
-        data_store.insert(invoice)
+    data_store.insert_many([make_invoice(i, 'invoice', Decimal('100.00')) for i in range(3)])
     
-    response = logged_in_client.get('/user/api/invoices')
+    response = logged_in_user_client.get('/user/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -231,26 +148,14 @@ def test_only_invoice_records_statistics(logged_in_client, app):
     assert Decimal(data['manual_amount']) == Decimal('0')
 
 
-def test_only_manual_records_statistics(logged_in_client, app):
+def test_only_manual_records_statistics(logged_in_user_client, app):
     """测试只有手动记录时的统计"""
     data_store = app.config['data_store']
     
     # 只创建手动记录
-    for i in range(4):
-        manual = Invoice(
-            invoice_number=f'MANUAL-00{i+1}',
-            invoice_date='2025-12-28',
-            item_name=f'手动项目{i+1}',
-            amount=Decimal('50.00'),
-            remark='',
-            file_path='MANUAL',
-            scan_time=datetime.now(),
-            uploaded_by='测试用户',
-            record_type='manual'
-        )
-        data_store.insert(manual)
+    data_store.insert_many([make_invoice(i, 'manual', Decimal('50.00')) for i in range(4)])
     
-    response = logged_in_client.get('/user/api/invoices')
+    response = logged_in_user_client.get('/user/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -2,112 +2,67 @@
 测试Task 23: 在管理员后台添加记录类型显示
 Requirements: 13.1, 13.2, 13.3
 """
-import pytest
-import os
-import tempfile
 from datetime import datetime
 from decimal import Decimal
 
-from src.sqlite_data_store import SQLiteDataStore
-from src.models import Invoice
-from invoice_web.app import create_app
-
-
-@pytest.fixture
-def test_db_path():
-    """创建临时测试数据库"""
-    fd, path = tempfile.mkstemp(suffix='.db')
-    os.close(fd)
-    yield path
-    if os.path.exists(path):
-        try:
-            os.remove(path)
-        except:
-            pass
-
-
-@pytest.fixture
-def app(test_db_path):
-    """创建测试应用"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SECRET_KEY'] = 'test-secret-key'
-    
-    # 使用测试数据库
-    data_store = SQLiteDataStore(test_db_path)
-    app.config['data_store'] = data_store
-    
-    # 创建管理员用户
-    data_store.create_user('admin', 'admin123', '管理员', is_admin=True)
-    
-    yield app
-
+import pytest
 
-@pytest.fixture
-def client(app):
-    """创建测试客户端"""
-    return app.test_client()
+from src.models import Invoice
+from tests.helpers import missing_substrings
 
 
-@pytest.fixture
-def logged_in_client(client):
-    """创建已登录的测试客户端"""
-    client.post('/api/auth/login', json={
-        'username': 'admin',
-        'password': 'admin123'
-    })
-    return client
+_RECORD_TYPE_COLUMN = ('记录类型'.encode('utf-8'), b'data-sort="record_type"')
 
 
-def test_admin_index_page_loads(logged_in_client):
+def test_admin_index_page_loads(logged_in_admin_client):
     """测试管理员后台首页可以加载"""
     # Admin portal might redirect, so we just check that the page is accessible
-    response = logged_in_client.get('/', follow_redirects=True)
+    response = logged_in_admin_client.get('/', follow_redirects=True)
     assert response.status_code == 200
 
 
-def test_admin_index_has_record_type_column(logged_in_client):
+def test_admin_index_has_record_type_column(logged_in_admin_client):
     """测试管理员后台表格包含记录类型列 (Requirement 13.1)"""
-    response = logged_in_client.get('/', follow_redirects=True)
+    response = logged_in_admin_client.get('/', follow_redirects=True)
     assert response.status_code == 200
     
     # 检查表头是否包含"记录类型"列
-    html_content = response.data.decode('utf-8')
-    assert '记录类型' in html_content
-    assert 'data-sort="record_type"' in html_content
+    assert not missing_substrings(response.data, _RECORD_TYPE_COLUMN)
+
 
+def test_admin_static_assets_served(logged_in_admin_client):
+    """测试管理员后台静态资源可以访问"""
+    for path in ('/static/css/style.css', '/static/js/app.js'):
+        response = logged_in_admin_client.get(path)
+        assert response.status_code == 200
+        response.close()
 
-def test_admin_css_has_badge_styles(logged_in_client):
+
+def test_admin_css_has_badge_styles(static_files):
     """测试管理员后台CSS包含徽章样式 (Requirement 13.3)"""
-    response = logged_in_client.get('/static/css/style.css')
-    assert response.status_code == 200
-    
-    css_content = response.data.decode('utf-8')
-    # 检查是否包含badge-invoice和badge-manual样式
-    assert '.badge-invoice' in css_content
-    assert '.badge-manual' in css_content
-    assert 'background-color: #0d6efd' in css_content  # badge-invoice color
-    assert 'background-color: #6c757d' in css_content  # badge-manual color
+    css_content = static_files['invoice_web/static/css/style.css']
+    # 检查是否包含badge-invoice和badge-manual样式及其颜色
+    assert not missing_substrings(css_content, (
+        '.badge-invoice',
+        '.badge-manual',
+        'background-color: #0d6efd',  # badge-invoice color
+        'background-color: #6c757d',  # badge-manual color
+    ))
 
 
-def test_admin_js_renders_record_type_badge(logged_in_client, app):
+def test_admin_js_renders_record_type_badge(static_files):
     """测试管理员后台JavaScript渲染记录类型徽章 (Requirements 13.2, 13.3)"""
-    # 读取JavaScript文件
-    response = logged_in_client.get('/static/js/app.js')
-    assert response.status_code == 200
-    
-    js_content = response.data.decode('utf-8')
+    js_content = static_files['invoice_web/static/js/app.js']
     # 检查是否包含记录类型徽章渲染逻辑
-    assert 'recordTypeBadge' in js_content
-    assert 'badge-manual' in js_content
-    assert 'badge-invoice' in js_content
-    assert '无票报销' in js_content
-    assert '有发票' in js_content
+    assert not missing_substrings(
+        js_content, ('recordTypeBadge', 'badge-manual', 'badge-invoice', '无票报销', '有发票')
+    )
 
 
-def test_api_returns_record_type_for_invoice(logged_in_client, app):
+def test_api_returns_record_type_for_invoice(logged_in_admin_client, app):
     """测试API返回发票记录的record_type字段"""
     data_store = app.config['data_store']
+    now = datetime.now()
     
     # 创建一个发票记录
     invoice = Invoice(
@@ -117,7 +72,7 @@ def test_api_returns_record_type_for_invoice(logged_in_client, app):
         amount=Decimal('100.00'),
         remark='测试备注',
         file_path='test.pdf',
-        scan_time=datetime.now(),
+        scan_time=now,
         uploaded_by='admin',
         reimbursement_person_id=None,
         reimbursement_status='未报销',
@@ -126,7 +81,7 @@ def test_api_returns_record_type_for_invoice(logged_in_client, app):
     data_store.insert(invoice)
     
     # 获取发票列表
-    response = logged_in_client.get('/api/invoices')
+    response = logged_in_admin_client.get('/api/invoices')
     print(f"API Response status: {response.status_code}")
     
     data = response.get_json()
@@ -144,9 +99,10 @@ def test_api_returns_record_type_for_invoice(logged_in_client, app):
         print(f"Skipping test - API not accessible or no data returned")
 
 
-def test_api_returns_record_type_for_manual(logged_in_client, app):
+def test_api_returns_record_type_for_manual(logged_in_admin_client, app):
     """测试API返回手动记录的record_type字段"""
     data_store = app.config['data_store']
+    now = datetime.now()
     
     # 创建一个手动记录
     manual_record = Invoice(
@@ -156,7 +112,7 @@ def test_api_returns_record_type_for_manual(logged_in_client, app):
         amount=Decimal('50.00'),
         remark='手动输入备注',
         file_path='',
-        scan_time=datetime.now(),
+        scan_time=now,
         uploaded_by='admin',
         reimbursement_person_id=None,
         reimbursement_status='未报销',
@@ -165,7 +121,7 @@ def test_api_returns_record_type_for_manual(logged_in_client, app):
     data_store.insert(manual_record)
     
     # 获取发票列表
-    response = logged_in_client.get('/api/invoices')
+    response = logged_in_admin_client.get('/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -180,9 +136,10 @@ def test_api_returns_record_type_for_manual(logged_in_client, app):
     assert manual['invoice_number'].startswith('MANUAL-')
 
 
-def test_mixed_records_display(logged_in_client, app):
+def test_mixed_records_display(logged_in_admin_client, app):
     """测试混合记录类型的显示"""
     data_store = app.config['data_store']
+    now = datetime.now()
     
     # 创建发票记录
     invoice = Invoice(
@@ -192,7 +149,7 @@ def test_mixed_records_display(logged_in_client, app):
         amount=Decimal('100.00'),
         remark='',
         file_path='test.pdf',
-        scan_time=datetime.now(),
+        scan_time=now,
         uploaded_by='admin',
         reimbursement_person_id=None,
         reimbursement_status='未报销',
@@ -208,7 +165,7 @@ def test_mixed_records_display(logged_in_client, app):
         amount=Decimal('50.00'),
         remark='',
         file_path='',
-        scan_time=datetime.now(),
+        scan_time=now,
         uploaded_by='admin',
         reimbursement_person_id=None,
         reimbursement_status='未报销',
@@ -217,7 +174,7 @@ def test_mixed_records_display(logged_in_client, app):
     data_store.insert(manual)
     
     # 获取发票列表
-    response = logged_in_client.get('/api/invoices')
+    response = logged_in_admin_client.get('/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -232,65 +189,4 @@ def test_mixed_records_display(logged_in_client, app):
 
 
 if __name__ == "__main__":
-    print("Running Task 23 Implementation Tests...\n")
-    
-    # 创建临时数据库
-    import tempfile
-    fd, db_path = tempfile.mkstemp(suffix='.db')
-    os.close(fd)
-    
-    try:
-        # 创建应用
-        app = create_app()
-        app.config['TESTING'] = True
-        app.config['SECRET_KEY'] = 'test-secret-key'
-        
-        # 使用测试数据库
-        data_store = SQLiteDataStore(db_path)
-        app.config['data_store'] = data_store
-        
-        # 创建管理员用户
-        data_store.create_user('admin', 'admin123', 'Admin', is_admin=True)
-        
-        client = app.test_client()
-        
-        # 登录
-        client.post('/api/auth/login', json={
-            'username': 'admin',
-            'password': 'admin123'
-        })
-        
-        # 运行测试
-        print("Test 1: Admin portal page loads...")
-        test_admin_index_page_loads(client)
-        print("PASS\n")
-        
-        print("Test 2: CSS includes badge styles...")
-        test_admin_css_has_badge_styles(client)
-        print("PASS\n")
-        
-        print("Test 3: JavaScript renders record type badges...")
-        test_admin_js_renders_record_type_badge(client, app)
-        print("PASS\n")
-        
-        print("Test 4: API returns record_type for invoice...")
-        test_api_returns_record_type_for_invoice(client, app)
-        print("PASS\n")
-        
-        print("Test 5: API returns record_type for manual...")
-        test_api_returns_record_type_for_manual(client, app)
-        print("PASS\n")
-        
-        print("Test 6: Mixed record types display...")
-        test_mixed_records_display(client, app)
-        print("PASS\n")
-        
-        print("\nAll tests passed!")
-        
-    finally:
-        # 清理
-        if os.path.exists(db_path):
-            try:
-                os.remove(db_path)
-            except:
-                pass
+    pytest.main([__file__, "-v"])
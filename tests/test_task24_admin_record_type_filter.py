@@ -3,30 +3,16 @@ Test for Task 24: Admin Record Type Filtering
 Requirements: 13.4, 13.5
 """
 import pytest
-from invoice_web.app import app
-from src.sqlite_data_store import SQLiteDataStore
 from src.models import Invoice
 from decimal import Decimal
 from datetime import datetime
 
 
 @pytest.fixture
-def client():
-    """Create a test client"""
-    app.config['TESTING'] = True
-    app.config['SECRET_KEY'] = 'test-secret-key'
-    with app.test_client() as client:
-        yield client
-
-
-@pytest.fixture
-def test_db():
-    """Create a test database with sample data"""
-    db_path = "test_admin_filter.db"
-    data_store = SQLiteDataStore(db_path)
-    
-    # Create test user (admin)
-    data_store.create_user("admin", "admin123", "管理员", is_admin=True)
+def test_db(clean_data_store):
+    """Populate the shared test database with sample data"""
+    data_store = clean_data_store
+    now = datetime.now()
     
     # Create invoice records
     invoice1 = Invoice(
@@ -36,7 +22,7 @@ def test_db():
         amount=Decimal("100.00"),
         remark="测试发票1",
         file_path="test1.pdf",
-        scan_time=datetime.now(),
+        scan_time=now,
         uploaded_by="管理员",
         reimbursement_person_id=None,
         reimbursement_status="未报销",
@@ -50,7 +36,7 @@ def test_db():
         amount=Decimal("50.00"),
         remark="测试手动记录1",
         file_path="MANUAL",
-        scan_time=datetime.now(),
+        scan_time=now,
         uploaded_by="管理员",
         reimbursement_person_id=None,
         reimbursement_status="未报销",
@@ -64,7 +50,7 @@ def test_db():
         amount=Decimal("200.00"),
         remark="测试发票2",
         file_path="test2.pdf",
-        scan_time=datetime.now(),
+        scan_time=now,
         uploaded_by="管理员",
         reimbursement_person_id=None,
         reimbursement_status="已报销",
@@ -78,24 +64,16 @@ def test_db():
         amount=Decimal("30.00"),
         remark="测试手动记录2",
         file_path="MANUAL",
-        scan_time=datetime.now(),
+        scan_time=now,
         uploaded_by="管理员",
         reimbursement_person_id=None,
         reimbursement_status="已报销",
         record_type="manual"
     )
     
-    data_store.insert(invoice1)
-    data_store.insert(invoice2)
-    data_store.insert(invoice3)
-    data_store.insert(invoice4)
-    
-    yield data_store
+    data_store.insert_many([invoice1, invoice2, invoice3, invoice4])
     
-    # Cleanup
-    import os
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    return data_store
 
 
 def test_admin_filter_all_records(client, test_db):
@@ -106,6 +84,7 @@ def test_admin_filter_all_records(client, test_db):
         'password': 'admin123'
     })
     assert response.status_code == 200
+    assert response.get_json()['user']['is_admin'] is True
     
     # Get all invoices without filter
     response = client.get('/api/invoices')
@@ -117,17 +96,10 @@ def test_admin_filter_all_records(client, test_db):
     assert len(data['invoices']) == 4
 
 
-def test_admin_filter_invoice_records(client, test_db):
+def test_admin_filter_invoice_records(logged_in_admin_client, test_db):
     """Test filtering only invoice records (Requirements: 13.4, 13.5)"""
-    # Login as admin
-    response = client.post('/api/auth/login', json={
-        'username': 'admin',
-        'password': 'admin123'
-    })
-    assert response.status_code == 200
-    
     # Get only invoice records
-    response = client.get('/api/invoices?record_type=invoice')
+    response = logged_in_admin_client.get('/api/invoices?record_type=invoice')
     assert response.status_code == 200
     data = response.get_json()
     
@@ -136,21 +108,13 @@ def test_admin_filter_invoice_records(client, test_db):
     assert len(data['invoices']) == 2
     
     # Verify all returned records are invoice type
-    for invoice in data['invoices']:
-        assert invoice['record_type'] == 'invoice'
+    assert {inv['record_type'] for inv in data['invoices']} == {'invoice'}
 
 
-def test_admin_filter_manual_records(client, test_db):
+def test_admin_filter_manual_records(logged_in_admin_client, test_db):
     """Test filtering only manual records (Requirements: 13.4, 13.5)"""
-    # Login as admin
-    response = client.post('/api/auth/login', json={
-        'username': 'admin',
-        'password': 'admin123'
-    })
-    assert response.status_code == 200
-    
     # Get only manual records
-    response = client.get('/api/invoices?record_type=manual')
+    response = logged_in_admin_client.get('/api/invoices?record_type=manual')
     assert response.status_code == 200
     data = response.get_json()
     
@@ -159,21 +123,13 @@ def test_admin_filter_manual_records(client, test_db):
     assert len(data['invoices']) == 2
     
     # Verify all returned records are manual type
-    for invoice in data['invoices']:
-        assert invoice['record_type'] == 'manual'
+    assert {inv['record_type'] for inv in data['invoices']} == {'manual'}
 
 
-def test_admin_filter_combined_with_status(client, test_db):
+def test_admin_filter_combined_with_status(logged_in_admin_client, test_db):
     """Test combining record type filter with status filter (Requirements: 13.5)"""
-    # Login as admin
-    response = client.post('/api/auth/login', json={
-        'username': 'admin',
-        'password': 'admin123'
-    })
-    assert response.status_code == 200
-    
     # Get only manual records with "已报销" status
-    response = client.get('/api/invoices?record_type=manual&reimbursement_status=已报销')
+    response = logged_in_admin_client.get('/api/invoices?record_type=manual&reimbursement_status=已报销')
     assert response.status_code == 200
     data = response.get_json()
     
@@ -184,17 +140,10 @@ def test_admin_filter_combined_with_status(client, test_db):
     assert data['invoices'][0]['reimbursement_status'] == '已报销'
 
 
-def test_admin_filter_combined_with_uploader(client, test_db):
+def test_admin_filter_combined_with_uploader(logged_in_admin_client, test_db):
     """Test combining record type filter with uploader filter (Requirements: 13.5)"""
-    # Login as admin
-    response = client.post('/api/auth/login', json={
-        'username': 'admin',
-        'password': 'admin123'
-    })
-    assert response.status_code == 200
-    
     # Get only invoice records uploaded by "管理员"
-    response = client.get('/api/invoices?record_type=invoice&uploaded_by=管理员')
+    response = logged_in_admin_client.get('/api/invoices?record_type=invoice&uploaded_by=管理员')
     assert response.status_code == 200
     data = response.get_json()
     
@@ -203,9 +152,8 @@ def test_admin_filter_combined_with_uploader(client, test_db):
     assert len(data['invoices']) == 2
     
     # Verify all returned records are invoice type and uploaded by "管理员"
-    for invoice in data['invoices']:
-        assert invoice['record_type'] == 'invoice'
-        assert invoice['uploaded_by'] == '管理员'
+    assert {inv['record_type'] for inv in data['invoices']} == {'invoice'}
+    assert all(inv['uploaded_by'] == '管理员' for inv in data['invoices'])
 
 
 if __name__ == '__main__':
@@ -5,6 +5,8 @@ Requirements: 13.4, 13.5
 This test verifies that the record_type parameter is properly passed through the API
 """
 
+from tests.helpers import missing_substrings, read_static_files
+
 
 def test_record_type_filter_parameter():
     """Test that record_type filter parameter is properly handled"""
@@ -24,9 +26,10 @@ def test_record_type_filter_parameter():
     # We can check the source code
     import invoice_web.routes as routes_module
     source = inspect.getsource(routes_module.get_invoices)
+    src_lower = source.lower()
     
     # Check if record_type is mentioned in the function
-    assert 'record_type' in source.lower(), "record_type parameter should be handled in get_invoices"
+    assert 'record_type' in src_lower, "record_type parameter should be handled in get_invoices"
     print("✓ record_type parameter is handled in get_invoices")
     
     # Check if it's retrieved from request.args
@@ -34,58 +37,41 @@ def test_record_type_filter_parameter():
     print("✓ record_type is retrieved from request.args")
     
     # Check if filtering is applied
-    assert 'record_type' in source and 'filter' in source.lower(), "record_type filtering should be applied"
+    assert 'filter' in src_lower, "record_type filtering should be applied"
     print("✓ record_type filtering logic is present")
     
     print("\n✅ All backend checks passed!")
     print("The record type filtering functionality has been successfully implemented.")
 
 
-def test_html_has_filter_buttons():
+def test_html_has_filter_buttons(static_files):
     """Test that the HTML has the record type filter buttons"""
-    with open('invoice_web/templates/index.html', 'r', encoding='utf-8') as f:
-        html_content = f.read()
-    
-    # Check for filter buttons
-    assert 'adminRecordTypeFilter' in html_content, "Record type filter radio buttons should exist"
-    print("✓ Record type filter radio buttons exist in HTML")
-    
-    assert 'admin-filter-all' in html_content, "'全部' filter button should exist"
-    print("✓ '全部' filter button exists")
+    html_content = static_files['invoice_web/templates/index.html']
     
-    assert 'admin-filter-invoice' in html_content, "'有发票' filter button should exist"
-    print("✓ '有发票' filter button exists")
-    
-    assert 'admin-filter-manual' in html_content, "'无票报销' filter button should exist"
-    print("✓ '无票报销' filter button exists")
+    # 筛选单选组及“全部/有发票/无票报销”三个按钮，一次扫描全部检查
+    missing = missing_substrings(html_content, [
+        'adminRecordTypeFilter', 'admin-filter-all', 'admin-filter-invoice', 'admin-filter-manual'
+    ])
+    assert not missing, f"Record type filter buttons missing from HTML: {missing}"
+    print("✓ Record type filter radio buttons and '全部'/'有发票'/'无票报销' buttons exist in HTML")
     
     print("\n✅ All HTML checks passed!")
 
 
-def test_javascript_has_filter_logic():
+def test_javascript_has_filter_logic(static_files):
     """Test that the JavaScript has the record type filter logic"""
-    with open('invoice_web/static/js/app.js', 'r', encoding='utf-8') as f:
-        js_content = f.read()
-    
-    # Check for recordTypeFilter in AppState
-    assert 'recordTypeFilter' in js_content, "recordTypeFilter should be in AppState"
-    print("✓ recordTypeFilter is in AppState")
-    
-    # Check for RecordTypeFilter object
-    assert 'RecordTypeFilter' in js_content, "RecordTypeFilter object should exist"
-    print("✓ RecordTypeFilter object exists")
-    
-    # Check for applyFilter method
-    assert 'applyFilter()' in js_content or 'applyFilter:' in js_content, "applyFilter method should exist"
-    print("✓ applyFilter method exists")
-    
-    # Check for event listeners
-    assert 'adminRecordTypeFilter' in js_content, "Event listeners for record type filter should exist"
-    print("✓ Event listeners for record type filter exist")
-    
-    # Check that API.getInvoices includes recordTypeFilter
-    assert 'AppState.recordTypeFilter' in js_content, "API calls should include recordTypeFilter"
-    print("✓ API calls include recordTypeFilter")
+    js_content = static_files['invoice_web/static/js/app.js']
+    
+    # AppState状态、RecordTypeFilter对象、事件监听及API调用参数，一次扫描全部检查
+    apply_filter = {'applyFilter()', 'applyFilter:'}
+    missing = missing_substrings(js_content, [
+        'recordTypeFilter', 'RecordTypeFilter', 'adminRecordTypeFilter', 'AppState.recordTypeFilter',
+        *apply_filter
+    ])
+    assert not missing - apply_filter, f"Record type filter logic missing from JavaScript: {missing - apply_filter}"
+    # applyFilter以方法调用或对象属性形式出现其一即可
+    assert not apply_filter <= missing, "applyFilter method should exist"
+    print("✓ recordTypeFilter, RecordTypeFilter.applyFilter, event listeners and API parameter exist")
     
     print("\n✅ All JavaScript checks passed!")
 
@@ -97,11 +83,12 @@ if __name__ == '__main__':
     print()
     
     try:
+        static_files = read_static_files()
         test_record_type_filter_parameter()
         print()
-        test_html_has_filter_buttons()
+        test_html_has_filter_buttons(static_files)
         print()
-        test_javascript_has_filter_logic()
+        test_javascript_has_filter_logic(static_files)
         print()
         print("=" * 60)
         print("✅ ALL TESTS PASSED!")
@@ -3,20 +3,19 @@ Test for Task 26: 修改管理员后台导出功能
 验证管理员后台导出包含记录类型列
 """
 
-import os
-import tempfile
+import io
 from datetime import datetime
 from decimal import Decimal
 
-from openpyxl import load_workbook
+import pytest
 from src.models import Invoice
 from src.export_service import ExportService
+from tests.helpers import read_exported_rows
 
 
-def test_admin_export_includes_record_type_column():
-    """测试管理员后台导出包含记录类型列"""
-    # 创建混合类型的测试数据（模拟管理员后台的数据）
-    invoices = [
+def _build_mixed_invoices():
+    """创建混合类型的测试数据（模拟管理员后台的数据）：3条发票记录、2条无票报销记录"""
+    return [
         Invoice(
             invoice_number='INV-001',
             invoice_date='2025-12-28',
@@ -68,191 +67,103 @@ def test_admin_export_includes_record_type_column():
             reimbursement_person_id=3,
             reimbursement_status='已报销',
             record_type='manual'
-        )
-    ]
-    
-    # 导出到临时文件
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-        output_path = tmp.name
-    
-    try:
-        export_service = ExportService()
-        export_service.export_to_excel(invoices, output_path)
-        
-        # 读取导出的文件
-        wb = load_workbook(output_path)
-        ws = wb.active
-        
-        # 验证表头包含"记录类型"列 (Requirement 13.7)
-        headers = [cell.value for cell in ws[1]]
-        assert '记录类型' in headers, "管理员后台导出应包含'记录类型'列"
-        
-        # 获取记录类型列的索引
-        record_type_col_idx = headers.index('记录类型') + 1
-        
-        # 验证第一条记录（发票）显示为"发票" (Requirement 13.7)
-        assert ws.cell(row=2, column=record_type_col_idx).value == '发票', \
-            "发票记录应显示为'发票'"
-        
-        # 验证第二条记录（手动记录）显示为"无票报销" (Requirement 13.7)
-        assert ws.cell(row=3, column=record_type_col_idx).value == '无票报销', \
-            "手动记录应显示为'无票报销'"
-        
-        # 验证第三条记录（发票）
-        assert ws.cell(row=4, column=record_type_col_idx).value == '发票'
-        
-        # 验证第四条记录（手动记录）
-        assert ws.cell(row=5, column=record_type_col_idx).value == '无票报销'
-        
-        print("✓ 管理员后台导出包含记录类型列，显示为'发票'或'无票报销'")
-        
-    finally:
-        # 清理临时文件
-        if os.path.exists(output_path):
-            os.remove(output_path)
-
-
-def test_admin_export_all_records():
-    """测试管理员后台导出包含所有记录"""
-    # 创建测试数据
-    invoices = [
+        ),
         Invoice(
-            invoice_number='INV-001',
-            invoice_date='2025-12-28',
-            item_name='办公用品',
-            amount=Decimal('100.00'),
+            invoice_number='INV-003',
+            invoice_date='2025-12-30',
+            item_name='会议费',
+            amount=Decimal('150.00'),
             remark='',
-            file_path='/path/to/pdf',
-            scan_time=datetime(2025, 12, 28, 10, 0, 0),
+            file_path='/path/to/pdf3',
+            scan_time=datetime(2025, 12, 30, 9, 0, 0),
             uploaded_by='张三',
             reimbursement_person_id=None,
             reimbursement_status='未报销',
             record_type='invoice'
-        ),
-        Invoice(
-            invoice_number='MANUAL-001',
-            invoice_date='2025-12-28',
-            item_name='交通费',
-            amount=Decimal('50.00'),
-            remark='',
-            file_path='MANUAL',
-            scan_time=datetime(2025, 12, 28, 11, 0, 0),
-            uploaded_by='李四',
-            reimbursement_person_id=None,
-            reimbursement_status='未报销',
-            record_type='manual'
         )
     ]
+
+
+def _export_rows():
+    """导出混合数据并以只读模式读回，返回全部行的值（行、列下标均从0开始）"""
+    buffer = io.BytesIO()
+    ExportService().export_to_excel(_build_mixed_invoices(), buffer)
+    buffer.seek(0)
+    return read_exported_rows(buffer)
+
+
+@pytest.fixture(scope="module")
+def exported_rows():
+    """模块内只导出、解析一次，各用例只读取其中的单元格"""
+    return _export_rows()
+
+
+def test_admin_export_includes_record_type_column(exported_rows):
+    """测试管理员后台导出包含记录类型列"""
+    # 验证表头包含"记录类型"列 (Requirement 13.7)
+    headers = exported_rows[0]
+    assert '记录类型' in headers, "管理员后台导出应包含'记录类型'列"
+    
+    # 获取记录类型列的索引
+    record_type_col_idx = headers.index('记录类型')
+    
+    # 验证第一条记录（发票）显示为"发票" (Requirement 13.7)
+    assert exported_rows[1][record_type_col_idx] == '发票', \
+        "发票记录应显示为'发票'"
+    
+    # 验证第二条记录（手动记录）显示为"无票报销" (Requirement 13.7)
+    assert exported_rows[2][record_type_col_idx] == '无票报销', \
+        "手动记录应显示为'无票报销'"
+    
+    # 验证第三条记录（发票）
+    assert exported_rows[3][record_type_col_idx] == '发票'
+    
+    # 验证第四条记录（手动记录）
+    assert exported_rows[4][record_type_col_idx] == '无票报销'
+    
+    # 验证第五条记录（发票）
+    assert exported_rows[5][record_type_col_idx] == '发票'
+    
+    print("✓ 管理员后台导出包含记录类型列，显示为'发票'或'无票报销'")
+
+
+def test_admin_export_all_records(exported_rows):
+    """测试管理员后台导出包含所有记录"""
+    # 验证所有记录都被导出 (Requirement 13.7)
+    assert len(exported_rows) >= 6, "应该导出所有记录（5条数据 + 1行表头）"
     
-    # 导出到临时文件
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-        output_path = tmp.name
+    # 验证发票号码列包含所有记录
+    invoice_numbers = {row[0] for row in exported_rows[1:6]}
+    assert {
+        'INV-001', 'INV-002', 'INV-003', 'MANUAL-20251228-100000-A1B2', 'MANUAL-20251229-120000-C3D4'
+    } <= invoice_numbers
     
-    try:
-        export_service = ExportService()
-        export_service.export_to_excel(invoices, output_path)
-        
-        # 读取导出的文件
-        wb = load_workbook(output_path)
-        ws = wb.active
-        
-        # 验证所有记录都被导出 (Requirement 13.7)
-        assert ws.max_row >= 3, "应该导出所有记录（2条数据 + 1行表头）"
-        
-        # 验证发票号码列包含所有记录
-        invoice_numbers = [ws.cell(row=i, column=1).value for i in range(2, 4)]
-        assert 'INV-001' in invoice_numbers
-        assert 'MANUAL-001' in invoice_numbers
-        
-        print("✓ 管理员后台导出包含所有记录")
-        
-    finally:
-        # 清理临时文件
-        if os.path.exists(output_path):
-            os.remove(output_path)
+    print("✓ 管理员后台导出包含所有记录")
 
 
-def test_admin_export_statistics():
+def test_admin_export_statistics(exported_rows):
     """测试管理员后台导出包含分类统计"""
-    # 创建混合类型的测试数据
-    invoices = [
-        Invoice(
-            invoice_number='INV-001',
-            invoice_date='2025-12-28',
-            item_name='办公用品',
-            amount=Decimal('100.00'),
-            remark='',
-            file_path='/path/to/pdf',
-            scan_time=datetime(2025, 12, 28, 10, 0, 0),
-            uploaded_by='张三',
-            reimbursement_person_id=None,
-            reimbursement_status='未报销',
-            record_type='invoice'
-        ),
-        Invoice(
-            invoice_number='INV-002',
-            invoice_date='2025-12-28',
-            item_name='餐饮费',
-            amount=Decimal('200.00'),
-            remark='',
-            file_path='/path/to/pdf2',
-            scan_time=datetime(2025, 12, 28, 11, 0, 0),
-            uploaded_by='李四',
-            reimbursement_person_id=None,
-            reimbursement_status='未报销',
-            record_type='invoice'
-        ),
-        Invoice(
-            invoice_number='MANUAL-001',
-            invoice_date='2025-12-28',
-            item_name='交通费',
-            amount=Decimal('50.00'),
-            remark='',
-            file_path='MANUAL',
-            scan_time=datetime(2025, 12, 28, 12, 0, 0),
-            uploaded_by='王五',
-            reimbursement_person_id=None,
-            reimbursement_status='未报销',
-            record_type='manual'
-        )
-    ]
+    # 查找统计信息行
+    summary_row = 1 + 5 + 1  # 1行表头 + 5条数据 + 1行空白
+    total_row, invoice_row, manual_row = exported_rows[summary_row:summary_row + 3]
+    
+    # 验证总计统计
+    assert '汇总统计' in str(total_row[0])
+    assert '总记录数: 5' in str(total_row[1])
+    
+    # 验证发票记录统计（显示"发票记录"）
+    assert '发票记录: 3张' in str(invoice_row[1])
     
-    # 导出到临时文件
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-        output_path = tmp.name
+    # 验证手动记录统计（显示"无票报销记录"）
+    assert '无票报销记录: 2张' in str(manual_row[1])
     
-    try:
-        export_service = ExportService()
-        export_service.export_to_excel(invoices, output_path)
-        
-        # 读取导出的文件
-        wb = load_workbook(output_path)
-        ws = wb.active
-        
-        # 查找统计信息行
-        summary_row = 3 + 3  # 3条数据 + 1行表头 + 2行空白
-        
-        # 验证总计统计
-        assert '汇总统计' in str(ws.cell(row=summary_row, column=1).value)
-        assert '总记录数: 3' in str(ws.cell(row=summary_row, column=2).value)
-        
-        # 验证发票记录统计（显示"发票记录"）
-        assert '发票记录: 2张' in str(ws.cell(row=summary_row + 1, column=2).value)
-        
-        # 验证手动记录统计（显示"无票报销记录"）
-        assert '无票报销记录: 1张' in str(ws.cell(row=summary_row + 2, column=2).value)
-        
-        print("✓ 管理员后台导出包含分类统计")
-        
-    finally:
-        # 清理临时文件
-        if os.path.exists(output_path):
-            os.remove(output_path)
+    print("✓ 管理员后台导出包含分类统计")
 
 
 if __name__ == "__main__":
     print("运行Task 26测试...\n")
-    test_admin_export_includes_record_type_column()
-    test_admin_export_all_records()
-    test_admin_export_statistics()
+    rows = _export_rows()
+    test_admin_export_includes_record_type_column(rows)
+    test_admin_export_all_records(rows)
+    test_admin_export_statistics(rows)
     print("\n所有测试通过！✓")
@@ -3,88 +3,50 @@ Integration test for Task 3: Duplicate Detection in API
 测试任务3：API中的重复检测集成
 """
 
-import os
-import sys
-import json
+import pytest
 
-# Add src directory to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-print("测试说明：")
-print("此测试验证 /user/api/create-manual 端点的重复检测功能")
-print("由于需要完整的Flask应用环境，此测试仅验证逻辑正确性")
-print()
-
-# 模拟测试场景
-print("场景1：创建第一条手动记录（应该成功）")
-request_data_1 = {
+# 场景1：首条手动记录，后续场景都在它已存在的前提下提交
+_FIRST_RECORD = {
     'item_name': '交通费',
     'amount': '50.00',
     'invoice_date': '2025-12-28',
     'remark': '打车费用',
     'reimbursement_person_id': None
 }
-print(f"  请求数据: {json.dumps(request_data_1, ensure_ascii=False, indent=2)}")
-print("  预期结果: 成功创建，返回 success=True")
-print()
-
-print("场景2：创建相同的手动记录（应该返回重复警告）")
-request_data_2 = {
-    'item_name': '交通费',
-    'amount': '50.00',
-    'invoice_date': '2025-12-28',
-    'remark': '打车费用（第二次）',
-    'reimbursement_person_id': None
-}
-print(f"  请求数据: {json.dumps(request_data_2, ensure_ascii=False, indent=2)}")
-print("  预期结果: 返回 is_duplicate_warning=True，包含相似记录信息")
-print("  预期响应格式:")
-expected_response = {
-    'success': False,
-    'is_duplicate_warning': True,
-    'message': '检测到相似的报销记录',
-    'similar_record': {
-        'invoice_number': 'MANUAL-20251228-XXXXXX-XXXX',
-        'item_name': '交通费',
-        'amount': '50.00',
-        'invoice_date': '2025-12-28',
-        'uploaded_by': '用户名',
-        'remark': '打车费用',
-        'scan_time': '2025-12-28T...',
-        'reimbursement_person_name': ''
-    }
-}
-print(f"  {json.dumps(expected_response, ensure_ascii=False, indent=2)}")
-print()
-
-print("场景3：用户选择继续创建（force_create=True）")
-request_data_3 = {
-    'item_name': '交通费',
-    'amount': '50.00',
-    'invoice_date': '2025-12-28',
-    'remark': '打车费用（确认创建）',
-    'reimbursement_person_id': None,
-    'force_create': True  # 用户确认继续创建
-}
-print(f"  请求数据: {json.dumps(request_data_3, ensure_ascii=False, indent=2)}")
-print("  预期结果: 成功创建，返回 success=True（跳过重复检测）")
-print()
 
-print("场景4：创建不同金额的记录（不应该重复）")
-request_data_4 = {
-    'item_name': '交通费',
-    'amount': '100.00',  # 不同金额
-    'invoice_date': '2025-12-28',
-    'remark': '打车费用',
-    'reimbursement_person_id': None
-}
-print(f"  请求数据: {json.dumps(request_data_4, ensure_ascii=False, indent=2)}")
-print("  预期结果: 成功创建，返回 success=True（金额不同，不重复）")
-print()
 
-print("✓ API集成测试场景验证完成")
-print()
-print("实际测试需要:")
-print("1. 启动Flask应用")
-print("2. 登录用户")
-print("3. 使用HTTP客户端（如curl或Postman）测试上述场景")
+@pytest.fixture
+def client_with_first_record(logged_in_user_client):
+    """已创建场景1记录的登录客户端"""
+    response = logged_in_user_client.post('/user/api/create-manual', json=_FIRST_RECORD)
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+    return logged_in_user_client
+
+
+@pytest.mark.parametrize("payload, expected_status", [
+    # 场景2：相同的手动记录，返回重复警告
+    ({**_FIRST_RECORD, 'remark': '打车费用（第二次）'}, 409),
+    # 场景3：用户确认继续创建，跳过重复检测
+    ({**_FIRST_RECORD, 'remark': '打车费用（确认创建）', 'force_create': True}, 200),
+    # 场景4：金额不同，不算重复
+    ({**_FIRST_RECORD, 'amount': '100.00'}, 200),
+], ids=['duplicate_warning', 'force_create', 'different_amount'])
+def test_create_manual_duplicate_flow(client_with_first_record, payload, expected_status):
+    """测试创建手动记录时的重复检测流程"""
+    response = client_with_first_record.post('/user/api/create-manual', json=payload)
+
+    assert response.status_code == expected_status
+    result = response.get_json()
+    if expected_status == 409:
+        assert result['success'] is False
+        assert result['is_duplicate_warning'] is True
+        similar = result['similar_record']
+        assert similar['invoice_number'].startswith('MANUAL-')
+        assert similar['item_name'] == _FIRST_RECORD['item_name']
+        assert similar['amount'] == _FIRST_RECORD['amount']
+        assert similar['remark'] == _FIRST_RECORD['remark']
+    else:
+        assert result['success'] is True
+        assert result['record']['amount'] == payload['amount']
@@ -1,84 +1,55 @@
 """
 测试任务5：修改发票列表API支持记录类型
+应用、内存数据库和已登录客户端由conftest中的会话级夹具提供，每个测试结束后清空业务数据
 """
 
-import pytest
 from decimal import Decimal
 from datetime import datetime
-from flask import Flask
+from functools import lru_cache
 from src.models import Invoice
-from src.sqlite_data_store import SQLiteDataStore
-from invoice_web.app import create_app
 
 
-@pytest.fixture
-def app():
-    """创建测试应用"""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SECRET_KEY'] = 'test-secret-key'
-    
-    # 使用内存数据库
-    data_store = SQLiteDataStore(':memory:')
-    app.config['data_store'] = data_store
-    
-    # 创建测试用户
-    data_store.create_user('testuser', 'password123', '测试用户')
-    
-    yield app
-
-
-@pytest.fixture
-def client(app):
-    """创建测试客户端"""
-    return app.test_client()
-
-
-@pytest.fixture
-def logged_in_client(client):
-    """创建已登录的测试客户端"""
-    # 登录
-    client.post('/user/api/login', json={
-        'username': 'testuser',
-        'password': 'password123'
-    })
-    return client
+@lru_cache(maxsize=None)
+def _amount(value: str) -> Decimal:
+    """金额字符串转Decimal，相同字面量只解析一次"""
+    return Decimal(value)
 
 
-def test_get_invoices_includes_record_type(logged_in_client, app):
+def test_get_invoices_includes_record_type(logged_in_user_client, app):
     """测试发票列表包含record_type字段"""
     data_store = app.config['data_store']
     
+    scan_time = datetime.now()
+    
     # 创建一个发票记录
     invoice = Invoice(
         invoice_number='INV001',
         invoice_date='2025-12-28',
         item_name='测试项目',
-        amount=Decimal('100.00'),
+        amount=_amount('100.00'),
         remark='测试备注',
         file_path='test.pdf',
-        scan_time=datetime.now(),
+        scan_time=scan_time,
         uploaded_by='测试用户',
         record_type='invoice'
     )
-    data_store.insert(invoice)
     
     # 创建一个手动记录
     manual = Invoice(
         invoice_number='MANUAL-001',
         invoice_date='2025-12-28',
         item_name='手动项目',
-        amount=Decimal('50.00'),
+        amount=_amount('50.00'),
         remark='手动备注',
         file_path='MANUAL',
-        scan_time=datetime.now(),
+        scan_time=scan_time,
         uploaded_by='测试用户',
         record_type='manual'
     )
-    data_store.insert(manual)
+    data_store.insert_many([invoice, manual])
     
     # 获取发票列表
-    response = logged_in_client.get('/user/api/invoices')
+    response = logged_in_user_client.get('/user/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -91,42 +62,43 @@ def test_get_invoices_includes_record_type(logged_in_client, app):
         assert inv['record_type'] in ['invoice', 'manual']
 
 
-def test_get_invoices_with_statistics(logged_in_client, app):
+def test_get_invoices_with_statistics(logged_in_user_client, app):
     """测试发票列表包含分类统计"""
     data_store = app.config['data_store']
     
-    # 创建2个发票记录
-    for i in range(2):
-        invoice = Invoice(
+    # 创建2个发票记录和3个手动记录，一次批量写入
+    scan_time = datetime.now()
+    invoices = [
+        Invoice(
             invoice_number=f'INV00{i+1}',
             invoice_date='2025-12-28',
             item_name=f'发票项目{i+1}',
-            amount=Decimal('100.00'),
+            amount=_amount('100.00'),
             remark='',
             file_path='test.pdf',
-            scan_time=datetime.now(),
+            scan_time=scan_time,
             uploaded_by='测试用户',
             record_type='invoice'
         )
-        data_store.insert(invoice)
-    
-    # 创建3个手动记录
-    for i in range(3):
-        manual = Invoice(
+        for i in range(2)
+    ] + [
+        Invoice(
             invoice_number=f'MANUAL-00{i+1}',
             invoice_date='2025-12-28',
             item_name=f'手动项目{i+1}',
-            amount=Decimal('50.00'),
+            amount=_amount('50.00'),
             remark='',
             file_path='MANUAL',
-            scan_time=datetime.now(),
+            scan_time=scan_time,
             uploaded_by='测试用户',
             record_type='manual'
         )
-        data_store.insert(manual)
+        for i in range(3)
+    ]
+    data_store.insert_many(invoices)
     
     # 获取发票列表
-    response = logged_in_client.get('/user/api/invoices')
+    response = logged_in_user_client.get('/user/api/invoices')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -143,45 +115,46 @@ def test_get_invoices_with_statistics(logged_in_client, app):
     assert data['total_count'] == 5
     assert data['invoice_count'] == 2
     assert data['manual_count'] == 3
-    assert Decimal(data['total_amount']) == Decimal('350.00')  # 2*100 + 3*50
-    assert Decimal(data['invoice_amount']) == Decimal('200.00')  # 2*100
-    assert Decimal(data['manual_amount']) == Decimal('150.00')  # 3*50
+    assert _amount(data['total_amount']) == _amount('350.00')  # 2*100 + 3*50
+    assert _amount(data['invoice_amount']) == _amount('200.00')  # 2*100
+    assert _amount(data['manual_amount']) == _amount('150.00')  # 3*50
 
 
-def test_filter_by_record_type_invoice(logged_in_client, app):
+def test_filter_by_record_type_invoice(logged_in_user_client, app):
     """测试按record_type=invoice过滤"""
     data_store = app.config['data_store']
     
+    scan_time = datetime.now()
+    
     # 创建发票记录
     invoice = Invoice(
         invoice_number='INV001',
         invoice_date='2025-12-28',
         item_name='发票项目',
-        amount=Decimal('100.00'),
+        amount=_amount('100.00'),
         remark='',
         file_path='test.pdf',
-        scan_time=datetime.now(),
+        scan_time=scan_time,
         uploaded_by='测试用户',
         record_type='invoice'
     )
-    data_store.insert(invoice)
     
     # 创建手动记录
     manual = Invoice(
         invoice_number='MANUAL-001',
         invoice_date='2025-12-28',
         item_name='手动项目',
-        amount=Decimal('50.00'),
+        amount=_amount('50.00'),
         remark='',
         file_path='MANUAL',
-        scan_time=datetime.now(),
+        scan_time=scan_time,
         uploaded_by='测试用户',
         record_type='manual'
     )
-    data_store.insert(manual)
+    data_store.insert_many([invoice, manual])
     
     # 过滤只获取发票记录
-    response = logged_in_client.get('/user/api/invoices?record_type=invoice')
+    response = logged_in_user_client.get('/user/api/invoices?record_type=invoice')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -190,40 +163,41 @@ def test_filter_by_record_type_invoice(logged_in_client, app):
     assert data['invoices'][0]['invoice_number'] == 'INV001'
 
 
-def test_filter_by_record_type_manual(logged_in_client, app):
+def test_filter_by_record_type_manual(logged_in_user_client, app):
     """测试按record_type=manual过滤"""
     data_store = app.config['data_store']
     
+    scan_time = datetime.now()
+    
     # 创建发票记录
     invoice = Invoice(
         invoice_number='INV001',
         invoice_date='2025-12-28',
         item_name='发票项目',
-        amount=Decimal('100.00'),
+        amount=_amount('100.00'),
         remark='',
         file_path='test.pdf',
-        scan_time=datetime.now(),
+        scan_time=scan_time,
         uploaded_by='测试用户',
         record_type='invoice'
     )
-    data_store.insert(invoice)
     
     # 创建手动记录
     manual = Invoice(
         invoice_number='MANUAL-001',
         invoice_date='2025-12-28',
         item_name='手动项目',
-        amount=Decimal('50.00'),
+        amount=_amount('50.00'),
         remark='',
         file_path='MANUAL',
-        scan_time=datetime.now(),
+        scan_time=scan_time,
         uploaded_by='测试用户',
         record_type='manual'
     )
-    data_store.insert(manual)
+    data_store.insert_many([invoice, manual])
     
     # 过滤只获取手动记录
-    response = logged_in_client.get('/user/api/invoices?record_type=manual')
+    response = logged_in_user_client.get('/user/api/invoices?record_type=manual')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -232,40 +206,41 @@ def test_filter_by_record_type_manual(logged_in_client, app):
     assert data['invoices'][0]['invoice_number'] == 'MANUAL-001'
 
 
-def test_filter_with_invalid_record_type(logged_in_client, app):
+def test_filter_with_invalid_record_type(logged_in_user_client, app):
     """测试使用无效的record_type参数时返回所有记录"""
     data_store = app.config['data_store']
     
+    scan_time = datetime.now()
+    
     # 创建发票记录
     invoice = Invoice(
         invoice_number='INV001',
         invoice_date='2025-12-28',
         item_name='发票项目',
-        amount=Decimal('100.00'),
+        amount=_amount('100.00'),
         remark='',
         file_path='test.pdf',
-        scan_time=datetime.now(),
+        scan_time=scan_time,
         uploaded_by='测试用户',
         record_type='invoice'
     )
-    data_store.insert(invoice)
     
     # 创建手动记录
     manual = Invoice(
         invoice_number='MANUAL-001',
         invoice_date='2025-12-28',
         item_name='手动项目',
-        amount=Decimal('50.00'),
+        amount=_amount('50.00'),
         remark='',
         file_path='MANUAL',
-        scan_time=datetime.now(),
+        scan_time=scan_time,
         uploaded_by='测试用户',
         record_type='manual'
     )
-    data_store.insert(manual)
+    data_store.insert_many([invoice, manual])
     
     # 使用无效的record_type参数
-    response = logged_in_client.get('/user/api/invoices?record_type=invalid')
+    response = logged_in_user_client.get('/user/api/invoices?record_type=invalid')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -273,42 +248,43 @@ def test_filter_with_invalid_record_type(logged_in_client, app):
     assert len(data['invoices']) == 2
 
 
-def test_statistics_with_filtered_results(logged_in_client, app):
+def test_statistics_with_filtered_results(logged_in_user_client, app):
     """测试过滤后的统计数据正确"""
     data_store = app.config['data_store']
     
-    # 创建2个发票记录
-    for i in range(2):
-        invoice = Invoice(
+    # 创建2个发票记录和3个手动记录，一次批量写入
+    scan_time = datetime.now()
+    invoices = [
+        Invoice(
             invoice_number=f'INV00{i+1}',
             invoice_date='2025-12-28',
             item_name=f'发票项目{i+1}',
-            amount=Decimal('100.00'),
+            amount=_amount('100.00'),
             remark='',
             file_path='test.pdf',
-            scan_time=datetime.now(),
+            scan_time=scan_time,
             uploaded_by='测试用户',
             record_type='invoice'
         )
-        data_store.insert(invoice)
-    
-    # 创建3个手动记录
-    for i in range(3):
-        manual = Invoice(
+        for i in range(2)
+    ] + [
+        Invoice(
             invoice_number=f'MANUAL-00{i+1}',
             invoice_date='2025-12-28',
             item_name=f'手动项目{i+1}',
-            amount=Decimal('50.00'),
+            amount=_amount('50.00'),
             remark='',
             file_path='MANUAL',
-            scan_time=datetime.now(),
+            scan_time=scan_time,
             uploaded_by='测试用户',
             record_type='manual'
         )
-        data_store.insert(manual)
+        for i in range(3)
+    ]
+    data_store.insert_many(invoices)
     
     # 过滤只获取手动记录
-    response = logged_in_client.get('/user/api/invoices?record_type=manual')
+    response = logged_in_user_client.get('/user/api/invoices?record_type=manual')
     assert response.status_code == 200
     
     data = response.get_json()
@@ -317,6 +293,6 @@ def test_statistics_with_filtered_results(logged_in_client, app):
     assert data['total_count'] == 3
     assert data['manual_count'] == 3
     assert data['invoice_count'] == 0
-    assert Decimal(data['total_amount']) == Decimal('150.00')
-    assert Decimal(data['manual_amount']) == Decimal('150.00')
-    assert Decimal(data['invoice_amount']) == Decimal('0')
+    assert _amount(data['total_amount']) == _amount('150.00')
+    assert _amount(data['manual_amount']) == _amount('150.00')
+    assert _amount(data['invoice_amount']) == _amount('0')
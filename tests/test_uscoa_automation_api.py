@@ -1,42 +1,25 @@
-import os
-import tempfile
 from io import BytesIO
 from time import sleep
 
 import pytest
 
 import invoice_web.routes as routes_module
-from invoice_web.app import create_app
-from src.sqlite_data_store import SQLiteDataStore
+from tests.helpers import login_as, make_test_app
 
 
 @pytest.fixture
-def data_store():
-    fd, db_path = tempfile.mkstemp(suffix='.db')
-    os.close(fd)
-    store = SQLiteDataStore(db_path)
-    store.create_user('admin', 'admin123', 'Admin', is_admin=True)
-    yield store
-    try:
-        os.remove(db_path)
-    except OSError:
-        pass
+def data_store(fresh_data_store):
+    return fresh_data_store
 
 
 @pytest.fixture
 def client(data_store):
-    app = create_app(data_store)
-    app.config['TESTING'] = True
-    app.config['SECRET_KEY'] = 'test-secret'
-    return app.test_client()
+    return make_test_app(data_store).test_client()
 
 
 @pytest.fixture
-def admin_client(client):
-    resp = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
-    assert resp.status_code == 200
-    assert resp.get_json()['success'] is True
-    return client
+def admin_client(client, data_store):
+    return login_as(client, data_store, 'admin')
 
 
 def test_uscoa_autofill_endpoint_returns_attachment_summary(admin_client, monkeypatch):
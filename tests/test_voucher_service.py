@@ -0,0 +1,62 @@
+import os
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.models import Invoice
+from src.sqlite_data_store import SQLiteDataStore
+from src.voucher_service import VoucherService
+
+
+@pytest.fixture
+def voucher_service(tmp_path):
+    data_store = SQLiteDataStore(":memory:")
+    data_store.insert(Invoice(
+        invoice_number="INV-BULK",
+        invoice_date="2025-12-28",
+        item_name="办公用品",
+        amount=Decimal("100.00"),
+        remark="",
+        file_path="test.pdf",
+        scan_time=datetime.now(),
+    ))
+    return VoucherService(data_store, voucher_dir=str(tmp_path / "vouchers"))
+
+
+def test_add_vouchers_bulk_returns_ids_in_input_order(voucher_service):
+    files = [(b"a", "a.jpg"), (b"b", "b.png"), (b"c", "c.jpeg")]
+
+    vouchers = voucher_service.add_vouchers_bulk("INV-BULK", files)
+
+    assert [v.original_filename for v in vouchers] == ["a.jpg", "b.png", "c.jpeg"]
+    stored = voucher_service.get_vouchers("INV-BULK")
+    assert [v.id for v in vouchers] == [v.id for v in stored]
+    assert [v.original_filename for v in stored] == ["a.jpg", "b.png", "c.jpeg"]
+    for voucher, (data, _) in zip(vouchers, files):
+        with open(voucher.file_path, "rb") as f:
+            assert f.read() == data
+
+
+def test_add_vouchers_bulk_skips_invalid_formats(voucher_service):
+    vouchers = voucher_service.add_vouchers_bulk("INV-BULK", [(b"a", "a.jpg"), (b"b", "b.gif")])
+
+    assert [v.original_filename for v in vouchers] == ["a.jpg"]
+    assert [v.original_filename for v in voucher_service.get_vouchers("INV-BULK")] == ["a.jpg"]
+    assert os.listdir(os.path.join(voucher_service.voucher_dir, "INV-BULK")) == [os.path.basename(vouchers[0].file_path)]
+
+
+def test_add_vouchers_bulk_with_only_invalid_formats_writes_nothing(voucher_service):
+    assert voucher_service.add_vouchers_bulk("INV-BULK", [(b"b", "b.gif")]) == []
+
+    assert voucher_service.get_vouchers("INV-BULK") == []
+    assert not os.path.exists(os.path.join(voucher_service.voucher_dir, "INV-BULK"))
+
+
+def test_add_vouchers_bulk_removes_written_files_when_insert_fails(voucher_service):
+    # 外键约束：发票不存在时整批插入失败
+    with pytest.raises(sqlite3.IntegrityError):
+        voucher_service.add_vouchers_bulk("INV-MISSING", [(b"a", "a.jpg"), (b"b", "b.png")])
+
+    assert os.listdir(os.path.join(voucher_service.voucher_dir, "INV-MISSING")) == []